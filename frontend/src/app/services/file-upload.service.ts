@@ -14,8 +14,9 @@ export interface DocumentUploadResponse {
   message: string;
   data: {
     document: any;
-    summary: any;
-    chat_session: any;
+    processing_status: 'processing' | 'completed' | 'failed';
+    summary: any | null;
+    chat_session: any | null;
     suggested_questions: string[];
     file_info: any;
   };
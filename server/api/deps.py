@@ -1,8 +1,9 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from core.security import verify_token
-from services.auth_service import AuthService
+from services.auth_service import get_auth_service
 from models.auth import User
+from utils.exceptions import BEARER_CHALLENGE_HEADERS
 
 security = HTTPBearer()
 
@@ -17,7 +18,7 @@ async def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+            headers=dict(BEARER_CHALLENGE_HEADERS),
         )
     
     email: str = payload.get("sub")
@@ -25,16 +26,16 @@ async def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+            headers=dict(BEARER_CHALLENGE_HEADERS),
         )
     
-    auth_service = AuthService()
+    auth_service = get_auth_service()
     user = await auth_service.get_user_by_email(email)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
+            headers=dict(BEARER_CHALLENGE_HEADERS),
         )
     
     return user
\ No newline at end of file
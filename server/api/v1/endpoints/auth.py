@@ -1,17 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from models.auth import GoogleOAuthLogin, User
 from models.response import Response
-from services.auth_service import AuthService
+from services.auth_service import AuthService, get_auth_service
 from api.deps import get_current_user
 from core.config import settings
 
 router = APIRouter()
 
 @router.post("/google", response_model=Response)
-async def google_oauth_login(oauth_data: GoogleOAuthLogin):
+async def google_oauth_login(
+    oauth_data: GoogleOAuthLogin,
+    auth_service: AuthService = Depends(get_auth_service)
+):
     """Authenticate user via Google OAuth. Creates account if user doesn't exist."""
     try:
-        auth_service = AuthService()
         result = await auth_service.authenticate_google_user(oauth_data)
         
         return Response(
@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from models.response import Response
 from models.auth import User
@@ -5,7 +6,7 @@ from models.chat import (
     ChatSessionCreate, SendMessageRequest, ChatSession, 
     ChatSessionWithMessages, ChatHistoryResponse
 )
-from services.chat_service import ChatService
+from services.chat_service import ChatService, get_chat_service
 from api.deps import get_current_user
 
 router = APIRouter()
@@ -13,14 +14,14 @@ router = APIRouter()
 @router.post("/sessions", response_model=Response)
 async def create_chat_session(
     session_data: ChatSessionCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """
     Create a new chat session with a document.
     Now includes initial AI message with document summary.
     """
     try:
-        chat_service = ChatService()
         session = await chat_service.create_chat_session(current_user.uid, session_data)
         
         # Get suggested questions for the new session
@@ -47,13 +48,13 @@ async def create_chat_session(
 async def send_message(
     session_id: str,
     message_data: SendMessageRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """
     Send a message in a chat session using Vertex AI for contextual responses.
     """
     try:
-        chat_service = ChatService()
         user_message, ai_message = await chat_service.send_message(
             session_id, current_user.uid, message_data
         )
@@ -79,18 +80,18 @@ async def get_chat_session(
     session_id: str,
     include_messages: bool = Query(True, description="Include chat messages"),
     message_limit: int = Query(50, ge=1, le=200, description="Maximum messages to return"),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="Message ID to continue after"),
+    current_user: User = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """
     Get a specific chat session with optional messages.
     Enhanced with document context and summary information.
     """
     try:
-        chat_service = ChatService()
-        
         if include_messages:
             session_with_messages = await chat_service.get_chat_session_with_messages(
-                session_id, current_user.uid, limit=message_limit
+                session_id, current_user.uid, limit=message_limit, after=cursor
             )
             
             user_message_count = sum(1 for msg in session_with_messages.messages if msg.role.value == 'user')
@@ -111,7 +112,8 @@ async def get_chat_session(
                     "session": session_with_messages,
                     "suggested_questions": suggested_questions,
                     "message_count": len(session_with_messages.messages),
-                    "user_message_count": user_message_count
+                    "user_message_count": user_message_count,
+                    "next_cursor": session_with_messages.next_cursor
                 }
             )
         else:
@@ -128,11 +130,11 @@ async def get_chat_session(
 @router.get("/sessions/{session_id}/suggested-questions", response_model=Response)
 async def get_session_suggested_questions(
     session_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """Get AI-generated suggested questions for a chat session."""
     try:
-        chat_service = ChatService()
         questions = await chat_service.get_session_suggested_questions(session_id, current_user.uid)
         
         return Response(
@@ -150,17 +152,17 @@ async def get_session_suggested_questions(
 async def get_chat_history(
     include_preview: bool = Query(True, description="Include last message preview"),
     limit: int = Query(50, ge=1, le=100, description="Maximum sessions to return"),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="Session ID to continue after"),
+    current_user: User = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """
     Get user's chat history with enhanced metadata.
     """
     try:
-        chat_service = ChatService()
-        sessions = await chat_service.get_user_chat_history(current_user.uid)
-        
-        # Apply limit
-        sessions = sessions[:limit]
+        sessions, next_cursor = await chat_service.get_user_chat_history(
+            current_user.uid, limit=limit, after=cursor
+        )
         
         enhanced_sessions = []
         
@@ -204,7 +206,8 @@ async def get_chat_history(
             data={
                 "sessions": enhanced_sessions,
                 "total_sessions": len(enhanced_sessions),
-                "showing_limit": limit
+                "showing_limit": limit,
+                "next_cursor": next_cursor
             }
         )
     except Exception as e:
@@ -214,11 +217,11 @@ async def get_chat_history(
 async def export_chat_session(
     session_id: str,
     format: str = Query("json", regex="^(json|txt|markdown)$", description="Export format"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """Export chat session in various formats."""
     try:
-        chat_service = ChatService()
         session_with_messages = await chat_service.get_chat_session_with_messages(
             session_id, current_user.uid
         )
@@ -303,12 +306,11 @@ async def export_chat_session(
 @router.delete("/sessions/{session_id}", response_model=Response)
 async def delete_chat_session(
     session_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """Delete a chat session and all its messages."""
     try:
-        chat_service = ChatService()
-        
         session = await chat_service.get_chat_session(session_id, current_user.uid)
         message_count = session.message_count
         
@@ -328,12 +330,12 @@ async def delete_chat_session(
 
 @router.get("/stats", response_model=Response)
 async def get_chat_stats(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """Get user's chat usage statistics."""
     try:
-        chat_service = ChatService()
-        sessions = await chat_service.get_user_chat_history(current_user.uid)
+        sessions, _ = await chat_service.get_user_chat_history(current_user.uid, limit=None)
         
         # Calculate stats
         total_sessions = len(sessions)
@@ -342,7 +344,8 @@ async def get_chat_stats(
         
         from datetime import datetime, timedelta
         week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_sessions = len([s for s in sessions if s.updated_at > week_ago])
+        # Firestore returns UTC-aware timestamps; compare as naive UTC
+        recent_sessions = len([s for s in sessions if s.updated_at.replace(tzinfo=None) > week_ago])
         
         most_active_session = None
         if sessions:
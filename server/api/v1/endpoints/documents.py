@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Query
-from typing import Optional
+from typing import List, Optional
 from models.response import Response
 from models.auth import User
 from models.document import DocumentUpload, DocumentWithSummary
-from services.document_service import DocumentService
+from core.config import settings
+from services.document_service import DocumentService, get_document_service
 from api.deps import get_current_user
 
 router = APIRouter()
@@ -12,21 +13,19 @@ router = APIRouter()
 async def upload_document_file(
     file: UploadFile = File(...),
     title: Optional[str] = Form(None),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """
-    Upload a document file (PDF, DOCX, TXT) with automatic processing.
+    Upload a document file (PDF, DOCX, TXT) and start its analysis.
     
-    Now returns:
-    - Document metadata
-    - AI-generated summary with highlights and key points  
-    - Auto-created chat session
-    - Suggested questions for the document
+    Returns the stored document straight away with processing_status
+    'processing'. The summary and suggested questions are produced in the
+    background; poll GET /{document_id} until the status is 'completed', or
+    request the summary, which waits for the analysis. Chat sessions are
+    created through POST /chat/sessions when the user starts chatting.
     """
     try:
-        document_service = DocumentService()
-        
-        # Upload and process the file (now includes AI processing and chat creation)
         result = await document_service.upload_file(
             user_id=current_user.uid, 
             file=file,
@@ -35,12 +34,14 @@ async def upload_document_file(
         
         return Response(
             success=True,
-            message="File uploaded and processed successfully",
+            message="File uploaded; analysis in progress",
             data={
                 "document": result["document"],
-                "summary": result["summary"], 
-                "chat_session": result["chat_session"],
-                "suggested_questions": result["suggested_questions"],
+                "processing_status": result["document"].processing_status,
+                # Filled in by the background analysis; kept for existing clients
+                "summary": None,
+                "chat_session": None,
+                "suggested_questions": [],
                 "file_info": result["file_info"]
             }
         )
@@ -48,17 +49,49 @@ async def upload_document_file(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/upload/batch", response_model=Response)
+async def upload_document_files(
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """
+    Upload several document files in one request.
+    
+    The files are stored and extracted concurrently and each is analyzed in
+    the background as with POST /upload. Results come back in upload order;
+    a file that could not be processed has an 'error' entry instead.
+    """
+    if len(files) > settings.MAX_BATCH_UPLOAD_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.MAX_BATCH_UPLOAD_FILES} files can be uploaded at once"
+        )
+    
+    try:
+        results = await document_service.upload_files(current_user.uid, files)
+        uploaded_count = sum(1 for result in results if 'error' not in result)
+        
+        return Response(
+            success=uploaded_count > 0,
+            message=f"{uploaded_count} of {len(files)} files uploaded; analysis in progress",
+            data={"results": results}
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/text", response_model=Response)
 async def upload_document_text(
     document_data: DocumentUpload,
     auto_create_chat: bool = Query(True, description="Automatically create chat session"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """
     Upload document as text content with optional auto-chat creation.
     """
     try:
-        document_service = DocumentService()
         document = await document_service.upload_document(current_user.uid, document_data)
         
         response_data = {"document": document}
@@ -71,18 +104,18 @@ async def upload_document_text(
                 response_data["summary"] = summary
                 
                 # Create chat session
-                from services.chat_service import ChatService
+                from services.chat_service import get_chat_service
                 from models.chat import ChatSessionCreate
                 
-                chat_service = ChatService()
+                chat_service = get_chat_service()
                 session_data = ChatSessionCreate(document_id=document.id)
                 chat_session = await chat_service.create_chat_session(current_user.uid, session_data)
                 response_data["chat_session"] = chat_session
                 
                 # Generate suggested questions
-                from services.ai_service import VertexAIService
-                ai_service = VertexAIService()
-                questions = await ai_service.generate_suggested_questions(document.content, document.title)
+                from services.ai_service import get_ai_service
+                ai_service = get_ai_service()
+                questions = await ai_service.generate_document_questions(document.content, document.title)
                 response_data["suggested_questions"] = questions
                 
             except Exception:
@@ -100,29 +133,25 @@ async def upload_document_text(
 async def get_documents(
     include_summaries: bool = Query(False, description="Include summary data"),
     limit: int = Query(50, ge=1, le=100, description="Maximum number of documents"),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="Document ID to continue after"),
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Get user's documents with optional summary information."""
     try:
-        document_service = DocumentService()
-        documents = await document_service.get_user_documents(current_user.uid)
-        
-        # Apply limit
-        documents = documents[:limit]
+        documents, next_cursor = await document_service.get_user_documents(
+            current_user.uid, limit=limit, after=cursor
+        )
         
-        response_data = {"documents": documents, "count": len(documents)}
+        response_data = {"documents": documents, "count": len(documents), "next_cursor": next_cursor}
         
         # Optionally include summaries
         if include_summaries:
-            documents_with_summaries = []
-            for doc in documents:
-                try:
-                    summary = await document_service.get_document_summary(doc.id, current_user.uid)
-                    doc_with_summary = DocumentWithSummary(document=doc, summary=summary)
-                except:
-                    doc_with_summary = DocumentWithSummary(document=doc, summary=None)
-                
-                documents_with_summaries.append(doc_with_summary)
+            summaries = await document_service.get_document_summaries(documents)
+            documents_with_summaries = [
+                DocumentWithSummary(document=doc, summary=summaries.get(doc.id))
+                for doc in documents
+            ]
             
             response_data["documents_with_summaries"] = documents_with_summaries
         
@@ -137,11 +166,11 @@ async def get_documents(
 @router.get("/{document_id}", response_model=Response)
 async def get_document(
     document_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Get a specific document by ID."""
     try:
-        document_service = DocumentService()
         document = await document_service.get_document_by_id(document_id, current_user.uid)
         
         return Response(
@@ -156,12 +185,11 @@ async def get_document(
 async def get_document_with_summary(
     document_id: str,
     regenerate: bool = Query(False, description="Force regenerate summary"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Get document with its AI-generated summary and analysis."""
     try:
-        document_service = DocumentService()
-        
         # Get document
         document = await document_service.get_document_by_id(document_id, current_user.uid)
         
@@ -169,10 +197,7 @@ async def get_document_with_summary(
         if regenerate:
             # Force regeneration by deleting existing summary first
             try:
-                # Delete existing summaries
-                summaries = document_service.summaries_collection.where('document_id', '==', document_id).get()
-                for summary in summaries:
-                    summary.reference.delete()
+                await document_service.delete_document_summary(document_id)
             except:
                 pass
         
@@ -182,7 +207,7 @@ async def get_document_with_summary(
             summary = None
         
         # Get associated chat sessions
-        chat_sessions = document_service.chat_sessions_collection.where(
+        chat_sessions = await document_service.chat_sessions_collection.where(
             'document_id', '==', document_id
         ).where('user_id', '==', current_user.uid).get()
         
@@ -212,11 +237,11 @@ async def get_document_with_summary(
 async def get_document_download_url(
     document_id: str,
     expiration_minutes: int = Query(60, ge=5, le=1440, description="URL expiration in minutes"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Generate a signed URL for downloading the original document file."""
     try:
-        document_service = DocumentService()
         document = await document_service.get_document_by_id(document_id, current_user.uid)
         
         if not hasattr(document, 'blob_path') or not document.blob_path:
@@ -245,16 +270,13 @@ async def get_document_download_url(
 @router.post("/{document_id}/regenerate-summary", response_model=Response)
 async def regenerate_document_summary(
     document_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Force regenerate AI summary for a document."""
     try:
-        document_service = DocumentService()
-        
         # Delete existing summary
-        summaries = document_service.summaries_collection.where('document_id', '==', document_id).get()
-        for summary in summaries:
-            summary.reference.delete()
+        await document_service.delete_document_summary(document_id)
         
         # Generate new summary
         summary = await document_service.get_document_summary(document_id, current_user.uid)
@@ -270,11 +292,11 @@ async def regenerate_document_summary(
 @router.delete("/{document_id}", response_model=Response)
 async def delete_document(
     document_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Delete a document, its GCS file, summaries, and associated chat sessions."""
     try:
-        document_service = DocumentService()
         await document_service.delete_document(document_id, current_user.uid)
         
         return Response(
@@ -290,15 +312,20 @@ async def get_detailed_document_history(
     include_summaries: bool = Query(False, description="Include summary information"),
     include_chat_info: bool = Query(True, description="Include chat session counts"),
     limit: int = Query(20, ge=1, le=100),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="Document ID to continue after"),
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Get detailed document processing history with enhanced metadata."""
     try:
-        document_service = DocumentService()
-        documents = await document_service.get_user_documents(current_user.uid)
+        documents, next_cursor = await document_service.get_user_documents(
+            current_user.uid, limit=limit, after=cursor
+        )
+        
+        summaries = await document_service.get_document_summaries(documents) if include_summaries else {}
         
         history = []
-        for doc in documents[:limit]:
+        for doc in documents:
             doc_history = {
                 "document_id": doc.id,
                 "title": doc.title,
@@ -313,23 +340,23 @@ async def get_detailed_document_history(
             
             # Add summary info if requested
             if include_summaries:
-                try:
-                    summary = await document_service.get_document_summary(doc.id, current_user.uid)
+                summary = summaries.get(doc.id)
+                if summary is not None:
                     doc_history["summary"] = {
                         "summary": summary.summary[:200] + "..." if len(summary.summary) > 200 else summary.summary,
                         "complexity_score": summary.complexity_score,
                         "key_points_count": len(summary.key_points),
                         "has_highlights": len(getattr(summary, 'highlights', [])) > 0
                     }
-                except:
+                else:
                     doc_history["summary"] = None
             
             # Add chat session info if requested
             if include_chat_info:
                 try:
-                    sessions = document_service.chat_sessions_collection.where(
+                    sessions = await document_service.chat_sessions_collection.where(
                         'document_id', '==', doc.id
-                    ).where('user_id', '==', current_user.uid).get()
+                    ).where('user_id', '==', current_user.uid).select(['message_count']).get()
                     
                     total_messages = sum(session.to_dict().get('message_count', 0) for session in sessions)
                     
@@ -349,7 +376,8 @@ async def get_detailed_document_history(
             data={
                 "history": history, 
                 "total_documents": len(history),
-                "showing_limit": limit
+                "showing_limit": limit,
+                "next_cursor": next_cursor
             }
         )
     except Exception as e:
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from models.auth import User
+from services.document_service import DocumentService, get_document_service
+from api.deps import get_current_user
+
+router = APIRouter()
+
+@router.get("/{blob_path:path}")
+async def download_file(
+    blob_path: str,
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """
+    Serve a locally stored document file to its owner.
+    
+    FileResponse streams the file from disk (with sendfile where available)
+    rather than reading it into memory first.
+    """
+    try:
+        file_path = document_service.file_storage.get_file_path(blob_path, current_user.uid)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return FileResponse(file_path, filename=file_path.name)
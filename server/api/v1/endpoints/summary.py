@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from models.response import Response
 from models.auth import User
 from models.document import DocumentUpload, EnhancedDocumentSummary
-from services.document_service import DocumentService
-from services.ai_service import VertexAIService
+from services.document_service import DocumentService, get_document_service
+from services.ai_service import get_ai_service
 from api.deps import get_current_user
 
 router = APIRouter()
@@ -12,15 +12,14 @@ router = APIRouter()
 async def create_summary_from_text(
     document_data: DocumentUpload,
     auto_create_chat: bool = Query(True, description="Automatically create chat session"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """
     Create summary for a document from text content.
     Enhanced to include highlights, key points, and optional chat creation.
     """
     try:
-        document_service = DocumentService()
-        
         # Upload document
         document = await document_service.upload_document(current_user.uid, document_data)
         
@@ -36,16 +35,16 @@ async def create_summary_from_text(
         # Optionally create chat session
         if auto_create_chat:
             try:
-                from services.chat_service import ChatService
+                from services.chat_service import get_chat_service
                 from models.chat import ChatSessionCreate
                 
-                chat_service = ChatService()
+                chat_service = get_chat_service()
                 session_data = ChatSessionCreate(document_id=document.id)
                 chat_session = await chat_service.create_chat_session(current_user.uid, session_data)
                 
                 # Generate suggested questions
-                ai_service = VertexAIService()
-                suggested_questions = await ai_service.generate_suggested_questions(
+                ai_service = get_ai_service()
+                suggested_questions = await ai_service.generate_document_questions(
                     document.content, document.title
                 )
                 
@@ -72,14 +71,14 @@ async def get_summary(
     document_id: str,
     include_highlights: bool = Query(True, description="Include text highlights"),
     include_statistics: bool = Query(False, description="Include processing statistics"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """
     Get enhanced summary for a specific document.
     Now includes highlights, detailed analysis, and optional statistics.
     """
     try:
-        document_service = DocumentService()
         summary = await document_service.get_document_summary(document_id, current_user.uid)
         
         # Get document for additional context if statistics requested
@@ -124,20 +123,15 @@ async def get_summary(
 async def regenerate_summary(
     document_id: str,
     enhanced_analysis: bool = Query(True, description="Include enhanced analysis features"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """
     Force regenerate summary for a document with enhanced analysis.
     """
     try:
-        document_service = DocumentService()
-        
         # Delete existing summary to force regeneration
-        summaries = document_service.summaries_collection.where('document_id', '==', document_id).get()
-        deleted_count = 0
-        for summary in summaries:
-            summary.reference.delete()
-            deleted_count += 1
+        deleted_count = await document_service.delete_document_summary(document_id)
         
         # Generate new summary
         summary = await document_service.get_document_summary(document_id, current_user.uid)
@@ -178,13 +172,13 @@ async def get_summary_highlights(
     document_id: str,
     min_score: float = Query(0.5, ge=0, le=1, description="Minimum relevance score for highlights"),
     limit: int = Query(10, ge=1, le=50, description="Maximum number of highlights"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """
     Get just the highlights from a document summary for frontend display.
     """
     try:
-        document_service = DocumentService()
         summary = await document_service.get_document_summary(document_id, current_user.uid)
         
 
@@ -226,13 +220,13 @@ async def get_summary_highlights(
 @router.get("/{document_id}/key-insights", response_model=Response)
 async def get_key_insights(
     document_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """
     Get structured key insights from document summary for dashboard display.
     """
     try:
-        document_service = DocumentService()
         summary = await document_service.get_document_summary(document_id, current_user.uid)
         document = await document_service.get_document_by_id(document_id, current_user.uid)
         
@@ -316,19 +310,14 @@ async def get_key_insights(
 @router.delete("/{document_id}/summary", response_model=Response)
 async def delete_summary(
     document_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Delete summary for a document (will be regenerated on next access)."""
     try:
-        document_service = DocumentService()
-        
         await document_service.get_document_by_id(document_id, current_user.uid)
         
-        summaries = document_service.summaries_collection.where('document_id', '==', document_id).get()
-        deleted_count = 0
-        for summary in summaries:
-            summary.reference.delete()
-            deleted_count += 1
+        deleted_count = await document_service.delete_document_summary(document_id)
         
         return Response(
             success=True,
@@ -16,10 +16,16 @@ class Settings(BaseSettings):
     # Google Cloud Storage settings
     GCS_BUCKET_NAME: str
     GCS_REGION: str = "us-central1"
+    GCS_CONTENT_CACHE_BYTES: int = 256 * 1024 * 1024  # In-process cache of downloaded file bodies
+    GCS_EXECUTOR_WORKERS: int = 32  # Threads for blocking GCS calls
     
     # Vertex AI settings
     VERTEX_AI_LOCATION: str = "us-central1"
+    VERTEX_AI_MODEL_NAME: str = "gemini-1.5-flash"
     VERTEX_MAX_TOKENS: int = 8000  # Conservative limit for text processing
+    CHUNK_CACHE_BYTES: int = 64 * 1024 * 1024  # Per cache: chunked documents and their keyword indexes
+    VERTEX_EXECUTOR_WORKERS: int = max(8, (os.cpu_count() or 1) + 4)  # Threads for blocking Vertex calls
+    UPLOAD_PROCESSING_CONCURRENCY: int = 4  # Uploads analyzed in the background at once
     
     # OAuth settings (keep existing)
     GOOGLE_CLIENT_ID: str
@@ -40,11 +46,15 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    STORAGE_BACKEND: str = "local"  # "local" or "gcs"
     LOCAL_STORAGE_PATH: str = "local_uploads" 
     
     # File upload settings
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_BATCH_UPLOAD_FILES: int = 10  # Files accepted by one batch upload request
     ALLOWED_EXTENSIONS: set = {".pdf", ".docx", ".doc", ".txt"}
+    FAST_PDF_TEXT: bool = True  # Skip pdfminer's figure and vertical-text layout passes
+    EXTRACTION_WORKERS: int = os.cpu_count() or 1  # Processes for PDF/DOCX parsing
     
     # Chunking and AI processing settings
     DEFAULT_CHUNK_SIZE: int = 3000
@@ -1,7 +1,8 @@
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore_async
 from core.config import settings
 import json
+from functools import lru_cache
 
 def initialize_firebase():
     """Initialize Firebase Admin SDK."""
@@ -20,6 +21,15 @@ def initialize_firebase():
         cred = credentials.Certificate(cred_dict)
         firebase_admin.initialize_app(cred)
 
+@lru_cache(maxsize=1)
 def get_firestore_client():
-    """Get Firestore client instance."""
-    return firestore.client()
+    """Get the process-wide async Firestore client."""
+    return firestore_async.client()
+
+async def warm_up_firestore():
+    """
+    Open the client's gRPC channel and fetch its auth token before traffic arrives.
+    
+    A missing-document read is the cheapest round trip that does both.
+    """
+    await get_firestore_client().collection('documents').document('_warmup').get()
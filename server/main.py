@@ -1,18 +1,22 @@
 import os
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from api.v1.router import api_router
 from core.config import settings
-from core.firebase_config import initialize_firebase
+from core.firebase_config import initialize_firebase, warm_up_firestore
+from services.ai_service import get_ai_service
+from utils.text_extractor import shutdown_extraction_pool
 
 app = FastAPI(
     title="Legal AI Backend",
     description="AI solution for simplifying legal documents",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     """Initializes directories and services when the app starts."""
     print("🚀 Starting up...")
     try:
@@ -20,6 +24,21 @@ def on_startup():
         print("✓ Firebase initialized")
     except Exception as e:
         print(f"✗ Firebase initialization failed: {e}")
+        return
+    
+    try:
+        await warm_up_firestore()
+        print("✓ Firestore connection warmed up")
+    except Exception as e:
+        print(f"✗ Firestore warm-up failed: {e}")
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Stops the text extraction workers and the AI service's threads."""
+    shutdown_extraction_pool()
+    # Only close an AI service that was actually created
+    if get_ai_service.cache_info().currsize:
+        await get_ai_service().aclose()
 
 app.add_middleware(
     CORSMiddleware,
@@ -59,6 +59,7 @@ class ChatSessionWithMessages(BaseModel):
     messages: List[ChatMessage]
     document_title: str
     document_summary: Optional[str] = None
+    next_cursor: Optional[str] = Field(None, description="Message ID to request the next page after")
     
     suggested_questions: List[str] = Field(default_factory=list)
     message_count: int = 0
@@ -26,6 +26,7 @@ class EnhancedDocumentSummary(BaseModel):
     obligations: List[str] = Field(default_factory=list, description="User obligations")
     rights: List[str] = Field(default_factory=list, description="User rights")
     risks: List[str] = Field(default_factory=list, description="Potential risks or concerns")
+    suggested_questions: List[str] = Field(default_factory=list, description="Suggested follow-up questions")
     created_at: datetime
     
     # Statistics
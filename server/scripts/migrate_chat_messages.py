@@ -0,0 +1,51 @@
+"""
+One-off migration: move messages from the flat chat_messages collection into
+chat_sessions/{session_id}/messages.
+
+Run from the server directory:
+    python -m scripts.migrate_chat_messages
+"""
+import asyncio
+from core.firebase_config import initialize_firebase, get_firestore_client
+from utils.firestore_utils import FIRESTORE_BATCH_LIMIT
+
+# Each message is one write to copy it and one to delete the original
+MESSAGES_PER_BATCH = FIRESTORE_BATCH_LIMIT // 2
+
+async def migrate_messages(db) -> int:
+    """Copy every flat message under its session and delete it; returns messages moved."""
+    sessions_collection = db.collection('chat_sessions')
+    moved_count = 0
+    batch = db.batch()
+    pending = 0
+
+    async for snapshot in db.collection('chat_messages').stream():
+        data = snapshot.to_dict()
+        target = sessions_collection.document(data['chat_session_id'])\
+            .collection('messages').document(snapshot.id)
+
+        batch.set(target, data)
+        batch.delete(snapshot.reference)
+        pending += 1
+
+        if pending == MESSAGES_PER_BATCH:
+            await batch.commit()
+            moved_count += pending
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        await batch.commit()
+        moved_count += pending
+
+    return moved_count
+
+async def main():
+    initialize_firebase()
+    db = get_firestore_client()
+
+    count = await migrate_messages(db)
+    print(f"✓ chat_messages: {count} messages moved under their sessions")
+
+if __name__ == "__main__":
+    asyncio.run(main())
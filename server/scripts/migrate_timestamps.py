@@ -0,0 +1,59 @@
+"""
+One-off migration: convert legacy ISO-8601 timestamp strings to native Firestore timestamps.
+
+Run from the server directory:
+    python -m scripts.migrate_timestamps
+"""
+import asyncio
+from datetime import datetime
+from core.firebase_config import initialize_firebase, get_firestore_client
+from utils.firestore_utils import FIRESTORE_BATCH_LIMIT
+
+TIMESTAMP_FIELDS = {
+    'documents': ['created_at', 'updated_at'],
+    'summaries': ['created_at'],
+    'chat_sessions': ['created_at', 'updated_at'],
+    'chat_messages': ['timestamp'],
+}
+
+async def migrate_collection(db, collection_name: str, fields: list) -> int:
+    """Rewrite string timestamp fields in one collection; returns documents updated."""
+    migrated_count = 0
+    batch = db.batch()
+    pending = 0
+
+    async for snapshot in db.collection(collection_name).stream():
+        data = snapshot.to_dict()
+        updates = {
+            field: datetime.fromisoformat(data[field])
+            for field in fields
+            if isinstance(data.get(field), str)
+        }
+        if not updates:
+            continue
+
+        batch.update(snapshot.reference, updates)
+        pending += 1
+
+        if pending == FIRESTORE_BATCH_LIMIT:
+            await batch.commit()
+            migrated_count += pending
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        await batch.commit()
+        migrated_count += pending
+
+    return migrated_count
+
+async def main():
+    initialize_firebase()
+    db = get_firestore_client()
+
+    for collection_name, fields in TIMESTAMP_FIELDS.items():
+        count = await migrate_collection(db, collection_name, fields)
+        print(f"✓ {collection_name}: {count} documents migrated")
+
+if __name__ == "__main__":
+    asyncio.run(main())
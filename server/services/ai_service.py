@@ -1,48 +1,98 @@
 import asyncio
+import hashlib
+from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
-import json
+import orjson
+from json_repair import repair_json
 from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel, ChatSession as VertexChatSession
+from vertexai.generative_models import GenerativeModel, GenerationConfig, ChatSession as VertexChatSession
 import vertexai
 from core.config import settings
+from core.firebase_config import get_firestore_client
+from services.prompts import (
+    SUMMARY_PROMPT, CHUNK_SUMMARY_PROMPT, CHAT_SYSTEM_PROMPT, QUESTIONS_PROMPT,
+    SUMMARY_SCHEMA, CHUNK_SUMMARY_SCHEMA, QUESTIONS_SCHEMA
+)
 from utils.exceptions import ServiceUnavailableError
 from utils.text_chunking import TextChunker
 
+# JSON-producing calls use structured output, so the caps only need to cover
+# the schema-shaped payload rather than free-form prose.
+_SUMMARY_CONFIG = GenerationConfig(
+    temperature=0.2,
+    top_p=0.8,
+    max_output_tokens=1024,
+    response_mime_type="application/json",
+    response_schema=SUMMARY_SCHEMA
+)
+_CHUNK_SUMMARY_CONFIG = GenerationConfig(
+    temperature=0.2,
+    max_output_tokens=512,
+    response_mime_type="application/json",
+    response_schema=CHUNK_SUMMARY_SCHEMA
+)
+_QUESTIONS_CONFIG = GenerationConfig(
+    temperature=0.8,
+    max_output_tokens=256,
+    response_mime_type="application/json",
+    response_schema=QUESTIONS_SCHEMA
+)
+
+_MODEL: Optional[GenerativeModel] = None
+_MODEL_LOCK = asyncio.Lock()
+
+def _init_model() -> GenerativeModel:
+    vertexai.init(
+        project=settings.GCP_PROJECT_ID,
+        location=settings.VERTEX_AI_LOCATION
+    )
+    return GenerativeModel(settings.VERTEX_AI_MODEL_NAME)
+
+async def get_model() -> GenerativeModel:
+    """Return the process-wide Vertex model, initializing Vertex AI on first use."""
+    global _MODEL
+    if _MODEL is None:
+        async with _MODEL_LOCK:
+            if _MODEL is None:
+                try:
+                    # init resolves credentials (file and metadata-server I/O)
+                    _MODEL = await asyncio.to_thread(_init_model)
+                except Exception as e:
+                    raise ServiceUnavailableError(f"Failed to initialize AI service: {str(e)}")
+    return _MODEL
+
+def _parse_json_response(text: str):
+    """Parse model JSON output, repairing fences, trailing commas and unclosed brackets."""
+    text = text.strip()
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+    try:
+        repaired = repair_json(text, return_objects=True)
+    except Exception:
+        return None
+    return repaired if isinstance(repaired, (dict, list)) else None
+
 class VertexAIService:
     """Vertex AI service for document summarization and chat."""
     
     def __init__(self):
-        """Initialize Vertex AI client."""
-        self.executor = ThreadPoolExecutor(max_workers=4)
-        self._initialize_vertex()
-        
-    def _initialize_vertex(self):
-        """Initialize Vertex AI with credentials."""
-        try:
-            # if settings.GOOGLE_APPLICATION_CREDENTIALS_JSON:
-            #     # Initialize from JSON string
-            #     import json
-            #     from google.oauth2 import service_account
-            #     credentials_info = json.loads(settings.GOOGLE_APPLICATION_CREDENTIALS_JSON)
-            #     credentials = service_account.Credentials.from_service_account_info(credentials_info)
-                
-            #     vertexai.init(
-            #         project=settings.GOOGLE_CLOUD_PROJECT_ID,
-            #         location=settings.VERTEX_AI_LOCATION,
-            #         credentials=credentials
-            #     )
-            # else:
-            #     vertexai.init(
-            #         project=settings.GOOGLE_CLOUD_PROJECT_ID,
-            #         location=settings.VERTEX_AI_LOCATION
-            #     )
-                
-            # self.model = GenerativeModel(settings.VERTEX_AI_MODEL_NAME)
-            print("ai service used")
-        except Exception as e:
-            raise ServiceUnavailableError(f"Failed to initialize AI service: {str(e)}")
+        """Set up the executor; the model itself is shared, see get_model()."""
+        self.executor = ThreadPoolExecutor(max_workers=settings.VERTEX_EXECUTOR_WORKERS)
+        self.db = get_firestore_client()
+        self.chunk_summaries_collection = self.db.collection('chunk_summaries')
+
+    async def aclose(self):
+        """Shut down the executor without waiting on in-flight generations."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
+    def __del__(self):
+        executor = getattr(self, "executor", None)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
     async def summarize_legal_document(self, content: str, title: str = "") -> Dict:
         """
         Summarize legal document using Vertex AI.
@@ -67,37 +117,15 @@ class VertexAIService:
 
     async def _summarize_single_chunk(self, content: str, title: str) -> Dict:
         """Summarize a single chunk of content."""
-        prompt = f"""
-        As a legal expert, analyze this legal document and provide a structured response.
-        
-        Document Title: {title}
-        Document Content: {content}
-        
-        Provide your analysis in the following JSON format:
-        {{
-            "summary": "A concise 2-3 paragraph summary of the document",
-            "key_points": ["5-7 most important points as bullet items"],
-            "complexity_score": 5,
-            "important_dates": ["Any deadlines, expiration dates, or time-sensitive items"],
-            "obligations": ["Key obligations or responsibilities"],
-            "rights": ["Important rights or entitlements"],
-            "highlights": [
-                {{"text": "Important text snippet", "reason": "Why this is important", "section": "Document section"}}
-            ]
-        }}
-        
-        Focus on making complex legal language accessible to non-lawyers while maintaining accuracy.
-        """
+        prompt = SUMMARY_PROMPT.substitute(title=title, content=content)
         
+        model = await get_model()
+
         def _generate_summary():
             try:
-                response = self.model.generate_content(
+                response = model.generate_content(
                     prompt,
-                    generation_config={
-                        "temperature": 0.2,
-                        "top_p": 0.8,
-                        "max_output_tokens": 2048
-                    }
+                    generation_config=_SUMMARY_CONFIG
                 )
                 return response.text
             except Exception as e:
@@ -107,9 +135,8 @@ class VertexAIService:
             self.executor, _generate_summary
         )
         
-        try:
-            result = json.loads(response_text.strip())
-            
+        result = _parse_json_response(response_text)
+        if isinstance(result, dict):
             required_fields = ['summary', 'key_points', 'complexity_score']
             for field in required_fields:
                 if field not in result:
@@ -117,36 +144,54 @@ class VertexAIService:
                     
             if 'highlights' not in result:
                 result['highlights'] = []
+            
+            # DocumentSummary only accepts 1-10; repaired JSON may hold anything
+            try:
+                result['complexity_score'] = min(10, max(1, int(result['complexity_score'])))
+            except (TypeError, ValueError):
+                result['complexity_score'] = self._get_fallback_value('complexity_score')
                 
             return result
             
-        except json.JSONDecodeError:
-            return self._create_fallback_summary(content, title)
+        return self._create_fallback_summary(content, title)
 
     async def _summarize_multiple_chunks(self, chunks: List[str], title: str) -> Dict:
-        """Summarize multiple chunks and combine results."""
+        """
+        Summarize multiple chunks and combine results.
+        
+        Chunk summaries are stored by content hash, so an amended or
+        re-uploaded document only sends the chunks that changed to the model.
+        """
         chunk_summaries = []
+        model = await get_model()
+        
+        chunk_refs = [
+            self.chunk_summaries_collection.document(hashlib.sha256(chunk.encode()).hexdigest())
+            for chunk in chunks
+        ]
+        known_summaries = {}
+        try:
+            async for snapshot in self.db.get_all(chunk_refs):
+                if snapshot.exists:
+                    known_summaries[snapshot.id] = snapshot.to_dict()
+        except Exception:
+            pass
+        new_summaries = []
         
         for i, chunk in enumerate(chunks):
-            chunk_prompt = f"""
-            Analyze this section of a legal document titled "{title}" (Part {i+1} of {len(chunks)}).
-            
-            Content: {chunk}
+            known_summary = known_summaries.get(chunk_refs[i].id)
+            if known_summary is not None:
+                chunk_summaries.append(known_summary)
+                continue
             
-            Provide a brief summary and key points in JSON format:
-            {{
-                "summary": "Summary of this section",
-                "key_points": ["3-5 key points from this section"],
-                "important_dates": ["Any dates in this section"],
-                "obligations": ["Obligations mentioned"],
-                "rights": ["Rights mentioned"]
-            }}
-            """
+            chunk_prompt = CHUNK_SUMMARY_PROMPT.substitute(
+                title=title, part=i + 1, total=len(chunks), chunk=chunk
+            )
             
             def _generate_chunk_summary():
-                response = self.model.generate_content(
+                response = model.generate_content(
                     chunk_prompt,
-                    generation_config={"temperature": 0.2, "max_output_tokens": 800}
+                    generation_config=_CHUNK_SUMMARY_CONFIG
                 )
                 return response.text
             
@@ -154,11 +199,19 @@ class VertexAIService:
                 self.executor, _generate_chunk_summary
             )
             
-            try:
-                chunk_summary = json.loads(chunk_response.strip())
+            chunk_summary = _parse_json_response(chunk_response)
+            if isinstance(chunk_summary, dict):
                 chunk_summaries.append(chunk_summary)
-            except json.JSONDecodeError:
-                continue
+                new_summaries.append((chunk_refs[i], chunk_summary))
+        
+        if new_summaries:
+            try:
+                batch = self.db.batch()
+                for chunk_ref, chunk_summary in new_summaries:
+                    batch.set(chunk_ref, chunk_summary)
+                await batch.commit()
+            except Exception:
+                pass
         
         # Combine chunk summaries
         return self._combine_chunk_summaries(chunk_summaries, title)
@@ -222,20 +275,7 @@ class VertexAIService:
             doc_context = doc_chunks[0] if doc_chunks else document_content[:6000]
             
             # Build conversation context
-            system_context = f"""You are an expert legal AI assistant helping users understand legal documents.
-
-DOCUMENT CONTEXT:
-Title: {document_title}
-Content: {doc_context}
-
-Your role is to:
-1. Answer questions about this specific document accurately
-2. Explain legal terms in plain English
-3. Highlight important obligations, rights, and deadlines
-4. Provide practical guidance when appropriate
-5. Reference specific parts of the document when relevant
-
-Be conversational, helpful, and always prioritize the user's understanding. If you're unsure about something specific to this document, say so rather than making assumptions."""
+            system_context = CHAT_SYSTEM_PROMPT.substitute(title=document_title, content=doc_context)
 
             # Build chat prompt with history
             conversation_prompt = system_context + "\n\n"
@@ -248,8 +288,10 @@ Be conversational, helpful, and always prioritize the user's understanding. If y
             
             conversation_prompt += f"\nHuman: {user_message}\nAssistant: "
             
+            model = await get_model()
+
             def _generate_chat_response():
-                response = self.model.generate_content(
+                response = model.generate_content(
                     conversation_prompt,
                     generation_config={
                         "temperature": 0.7,
@@ -276,24 +318,14 @@ Be conversational, helpful, and always prioritize the user's understanding. If y
             chunks = TextChunker.chunk_text(document_content, max_tokens=4000)
             content = chunks[0] if chunks else document_content
             
-            prompt = f"""Based on this legal document, generate 5 helpful questions that would help someone understand it better:
+            prompt = QUESTIONS_PROMPT.substitute(title=document_title, content=content)
 
-Title: {document_title}
-Content: {content}
-
-Focus on questions about:
-- Key obligations and rights
-- Important deadlines
-- Potential risks or concerns
-- Practical implications
-- Next steps
-
-Return as JSON array: ["question1", "question2", "question3", "question4", "question5"]"""
+            model = await get_model()
 
             def _generate_questions():
-                response = self.model.generate_content(
+                response = model.generate_content(
                     prompt,
-                    generation_config={"temperature": 0.8, "max_output_tokens": 400}
+                    generation_config=_QUESTIONS_CONFIG
                 )
                 return response.text
             
@@ -301,11 +333,9 @@ Return as JSON array: ["question1", "question2", "question3", "question4", "ques
                 self.executor, _generate_questions
             )
             
-            try:
-                questions = json.loads(response_text.strip())
-                return questions if isinstance(questions, list) else []
-            except json.JSONDecodeError:
-                pass
+            questions = _parse_json_response(response_text)
+            if isinstance(questions, list):
+                return questions
                 
         except Exception:
             pass        
@@ -353,4 +383,9 @@ Return as JSON array: ["question1", "question2", "question3", "question4", "ques
         return fallbacks.get(field)
 
 # Alias for backward compatibility
-AIService = VertexAIService
\ No newline at end of file
+AIService = VertexAIService
+
+@lru_cache(maxsize=1)
+def get_ai_service() -> VertexAIService:
+    """Process-wide AI service so its executor is shared across requests."""
+    return VertexAIService()
@@ -1,5 +1,8 @@
+import hashlib
+from functools import lru_cache
 from typing import Optional
 from datetime import datetime, timedelta
+from google.api_core.exceptions import AlreadyExists
 from core.firebase_config import get_firestore_client
 from core.security import create_access_token
 from models.auth import GoogleOAuthLogin, User
@@ -24,22 +27,17 @@ class AuthService:
         if not google_user_info['email_verified']:
             raise AuthenticationError("Email not verified with Google")
 
-        # Check if user exists by email
-        existing_users = self.users_collection.where('email', '==', google_user_info['email']).limit(1).get()
-        existing_users_list = list(existing_users)
+        user_ref = self._user_ref(google_user_info['email'])
+        user_doc = await self._get_user_doc(google_user_info['email'])
 
-        if existing_users_list:
+        if user_doc:
             # User exists - update info if needed
-            user_doc = existing_users_list[0].to_dict()
-            user_id = user_doc['uid']
-            
-            # Update user info (in case name or picture changed)
             updates = {
                 'full_name': google_user_info['full_name'],
                 'picture': google_user_info['picture'],
                 'google_id': google_user_info['google_id']  # Ensure Google ID is set
             }
-            self.users_collection.document(user_id).update(updates)
+            await user_ref.update(updates)
             user_doc.update(updates)
         else:
             # Create new user from Google info
@@ -54,7 +52,11 @@ class AuthService:
                 'is_active': True,
                 'auth_provider': 'google'
             }
-            self.users_collection.document(user_id).set(user_doc)
+            try:
+                await user_ref.create(user_doc)
+            except AlreadyExists:
+                # A concurrent first login created the account
+                user_doc = (await user_ref.get()).to_dict()
 
         # Create access token
         access_token = create_access_token(
@@ -70,8 +72,12 @@ class AuthService:
 
     async def get_user_by_email(self, email: str) -> Optional[User]:
         """Get user by email."""
-        users = self.users_collection.where('email', '==', email).limit(1).get()
-        users_list = list(users)
+        user_doc = await self._get_user_doc(email)
+        return User(**user_doc) if user_doc else None
+
+    async def get_user_by_google_id(self, google_id: str) -> Optional[User]:
+        """Get user by Google ID."""
+        users_list = await self.users_collection.where('google_id', '==', google_id).limit(1).get()
         
         if not users_list:
             return None
@@ -79,13 +85,27 @@ class AuthService:
         user_doc = users_list[0].to_dict()
         return User(**user_doc)
 
-    async def get_user_by_google_id(self, google_id: str) -> Optional[User]:
-        """Get user by Google ID."""
-        users = self.users_collection.where('google_id', '==', google_id).limit(1).get()
-        users_list = list(users)
-        
-        if not users_list:
+    def _user_ref(self, email: str):
+        """Users are keyed by a hash of their email, so lookups are a single get."""
+        return self.users_collection.document(hashlib.sha256(email.lower().encode()).hexdigest())
+
+    async def _get_user_doc(self, email: str) -> Optional[dict]:
+        """Fetch a user record by email, moving legacy UUID-keyed records to the email key."""
+        user_ref = self._user_ref(email)
+        snapshot = await user_ref.get()
+        if snapshot.exists:
+            return snapshot.to_dict()
+
+        # Accounts created before email-keyed IDs are stored under their uid
+        legacy_users = await self.users_collection.where('email', '==', email).limit(1).get()
+        if not legacy_users:
             return None
 
-        user_doc = users_list[0].to_dict()
-        return User(**user_doc)
\ No newline at end of file
+        user_doc = legacy_users[0].to_dict()
+        await user_ref.set(user_doc)
+        return user_doc
+
+@lru_cache(maxsize=1)
+def get_auth_service() -> AuthService:
+    """Process-wide auth service; it holds no per-request state."""
+    return AuthService()
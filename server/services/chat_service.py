@@ -1,288 +1,327 @@
-from typing import List
+import asyncio
+from collections import deque
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from datetime import datetime
+from google.cloud import firestore
+from cachetools import LRUCache
 from core.firebase_config import get_firestore_client
 from models.chat import (
     ChatSession, ChatMessage, MessageRole, ChatSessionCreate, 
     SendMessageRequest, ChatSessionWithMessages
 )
-from services.document_service import DocumentService
-from services.ai_service import VertexAIService
-from utils.exceptions import NotFoundError, ServiceUnavailableError
+from services.document_service import get_document_service
+from services.ai_service import get_ai_service
+from utils.exceptions import NotFoundError, service_errors
+from utils.firestore_utils import delete_query_in_batches, start_after_id
 import uuid
 
+# Fields stored on a chat session document that ChatSession is built from
+CHAT_SESSION_FIELDS = [
+    'id', 'user_id', 'document_id', 'title', 'created_at',
+    'updated_at', 'message_count', 'is_active'
+]
+
+# Opening AI message of a new session, with and without a stored summary
+INTRO_MESSAGE_TEMPLATE = """I've analyzed the document "{title}". Here's what I found:
+
+**Summary:**
+{summary}
+
+**Key Points:**
+{bullets}
+
+You can ask me any questions about this document, and I'll help you understand its contents, implications, and answer any legal questions you might have."""
+INTRO_MESSAGE_FALLBACK_TEMPLATE = """I have the document "{title}" available for discussion. You can ask me any questions about its contents, and I'll help you understand its implications and answer any legal questions you might have."""
+
+# Last few messages per session for AI context, kept in step by _add_message so
+# chat turns do not re-query Firestore for history they just wrote.
+RECENT_MESSAGES_WINDOW = 10
+_recent_messages_cache: LRUCache = LRUCache(maxsize=1024)
+
+# Bumped around every message write, so a history read that overlapped a
+# write knows its snapshot may be stale and does not cache it
+_message_write_versions: LRUCache = LRUCache(maxsize=1024)
+
+def _bump_message_writes(session_id: str) -> None:
+    _message_write_versions[session_id] = _message_write_versions.get(session_id, 0) + 1
+
+def forget_recent_messages(session_ids) -> None:
+    """Drop cached history for sessions that have been deleted."""
+    for session_id in session_ids:
+        _recent_messages_cache.pop(session_id, None)
+
 class ChatService:
     """Chat service with Vertex AI integration."""
     
     def __init__(self):
         self.db = get_firestore_client()
         self.chat_sessions_collection = self.db.collection('chat_sessions')
-        self.chat_messages_collection = self.db.collection('chat_messages')
-        self.ai_service = VertexAIService()
+        self.ai_service = get_ai_service()
+        self.document_service = get_document_service()
 
+    @service_errors("Could not create chat session")
     async def create_chat_session(self, user_id: str, session_data: ChatSessionCreate) -> ChatSession:
         """Create a new chat session with a document."""
+        # The summary is only needed for the intro message and may have to be
+        # generated, so start it now and let it run behind the ownership check
+        summary_task = asyncio.ensure_future(
+            self.document_service.get_document_summary(session_data.document_id, user_id)
+        )
+        
+        # Verify document exists and belongs to user
         try:
-            # Import here to avoid circular import
-            from services.document_service import DocumentService
-            document_service = DocumentService()
-            
-            # Verify document exists and belongs to user
-            document = await document_service.get_document_by_id(session_data.document_id, user_id)
-            
-            session_id = str(uuid.uuid4())
-            title = session_data.title or f"Chat about {document.title}"
-            
-            session_dict = {
-                'id': session_id,
-                'user_id': user_id,
-                'document_id': session_data.document_id,
-                'title': title,
-                'created_at': datetime.utcnow(),
-                'updated_at': datetime.utcnow(),
-                'message_count': 0,
-                'is_active': True
-            }
-
-            self.chat_sessions_collection.document(session_id).set({
-                **session_dict,
-                'created_at': session_dict['created_at'].isoformat(),
-                'updated_at': session_dict['updated_at'].isoformat()
-            })
+            document = await self.document_service.get_document_by_id(session_data.document_id, user_id)
+        except Exception:
+            summary_task.cancel()
+            raise
 
-            try:
-                summary = await document_service.get_document_summary(session_data.document_id, user_id)
-                system_content = f"""I've analyzed the document "{document.title}". Here's what I found:
+        summary, = await asyncio.gather(summary_task, return_exceptions=True)
 
-**Summary:**
-{summary.summary}
+        if not isinstance(summary, Exception):
+            system_content = INTRO_MESSAGE_TEMPLATE.format_map({
+                'title': document.title,
+                'summary': summary.summary,
+                'bullets': "\n".join(["• " + point for point in summary.key_points])
+            })
+        else:
+            system_content = INTRO_MESSAGE_FALLBACK_TEMPLATE.format_map({'title': document.title})
 
-**Key Points:**
-{chr(10).join(f'• {point}' for point in summary.key_points)}
+        session_id = str(uuid.uuid4())
+        message_id = str(uuid.uuid4())
+        title = session_data.title or f"Chat about {document.title}"
+        now = datetime.utcnow()
+        
+        session_dict = {
+            'id': session_id,
+            'user_id': user_id,
+            'document_id': session_data.document_id,
+            'title': title,
+            'created_at': now,
+            'updated_at': now,
+            'message_count': 1,
+            'is_active': True
+        }
+        message_dict = {
+            'id': message_id,
+            'chat_session_id': session_id,
+            'role': MessageRole.AI.value,
+            'content': system_content,
+            'timestamp': now
+        }
 
-You can ask me any questions about this document, and I'll help you understand its contents, implications, and answer any legal questions you might have."""
-            except Exception as e:
-                system_content = f"""I have the document "{document.title}" available for discussion. You can ask me any questions about its contents, and I'll help you understand its implications and answer any legal questions you might have."""
+        # Session and intro message land in a single commit
+        batch = self.db.batch()
+        batch.set(self.chat_sessions_collection.document(session_id), session_dict)
+        batch.set(self._messages_collection(session_id).document(message_id), message_dict)
+        await batch.commit()
 
-            await self._add_message(session_id, MessageRole.AI, system_content)
-            
-            return ChatSession(**session_dict)
-            
-        except Exception as e:
-            raise ServiceUnavailableError(f"Could not create chat session: {str(e)}")
+        _recent_messages_cache[session_id] = deque(
+            [{'role': message_dict['role'], 'content': system_content}],
+            maxlen=RECENT_MESSAGES_WINDOW
+        )
+        
+        return ChatSession(**session_dict)
 
+    @service_errors("Could not process message")
     async def send_message(self, session_id: str, user_id: str, message_request: SendMessageRequest) -> tuple[ChatMessage, ChatMessage]:
         """Send a message and get AI response using Vertex AI."""
-        try:
-            # Verify session exists and belongs to user
-            session = await self.get_chat_session(session_id, user_id)
-            
-            # Add user message
-            user_message = await self._add_message(session_id, MessageRole.USER, message_request.message)
-            
-            # Get document context
-            from services.document_service import DocumentService
-            document_service = DocumentService()
-            document = await document_service.get_document_by_id(session.document_id, user_id)
-            
-            # Get recent messages for context
-            recent_messages = await self._get_recent_messages(session_id, limit=10)
-            
-            # Generate AI response using Vertex AI
-            ai_response_content = await self.ai_service.chat_with_document(
-                document_content=document.content,
-                document_title=document.title,
-                user_message=message_request.message,
-                chat_history=recent_messages
-            )
-            
-            ai_message = await self._add_message(session_id, MessageRole.AI, ai_response_content)            
-            await self._update_session_timestamp(session_id)
-            
-            return user_message, ai_message
-            
-        except NotFoundError:
-            raise
-        except Exception as e:
-            raise ServiceUnavailableError(f"Could not process message: {str(e)}")
+        # Verify session exists and belongs to user
+        session = await self.get_chat_session(session_id, user_id)
+        
+        # Save the user message while loading document context; history is
+        # read after the write so it includes the new message
+        user_message, document = await asyncio.gather(
+            self._add_message(session_id, MessageRole.USER, message_request.message),
+            self.document_service.get_document_by_id(session.document_id, user_id)
+        )
+        recent_messages = await self._get_recent_messages(session_id, limit=10)
+        
+        # Generate AI response using Vertex AI
+        ai_response_content = await self.ai_service.chat_with_document(
+            document_content=document.content,
+            document_title=document.title,
+            user_message=message_request.message,
+            chat_history=recent_messages
+        )
+        
+        ai_message = await self._add_message(session_id, MessageRole.AI, ai_response_content)
+        
+        return user_message, ai_message
 
+    @service_errors("Could not retrieve chat session")
     async def get_chat_session(self, session_id: str, user_id: str) -> ChatSession:
         """Get a specific chat session."""
-        try:
-            session_ref = self.chat_sessions_collection.document(session_id)
-            session_doc = session_ref.get()
-            
-            if not session_doc.exists:
-                raise NotFoundError("Chat session not found")
-                
-            session_data = session_doc.to_dict()
-            
-            # Verify ownership
-            if session_data['user_id'] != user_id:
-                raise NotFoundError("Chat session not found")
+        session_ref = self.chat_sessions_collection.document(session_id)
+        session_doc = await session_ref.get()
+        
+        if not session_doc.exists:
+            raise NotFoundError("Chat session not found")
+            
+        session_data = session_doc.to_dict()
+        
+        # Verify ownership
+        if session_data['user_id'] != user_id:
+            raise NotFoundError("Chat session not found")
+        
+        return ChatSession(**session_data)
 
-            session_data['created_at'] = datetime.fromisoformat(session_data['created_at'])
-            session_data['updated_at'] = datetime.fromisoformat(session_data['updated_at'])
-            
-            return ChatSession(**session_data)
-            
-        except NotFoundError:
-            raise
-        except Exception as e:
-            raise ServiceUnavailableError(f"Could not retrieve chat session: {str(e)}")
+    @service_errors("Could not retrieve chat session")
+    async def get_chat_session_with_messages(self, session_id: str, user_id: str, limit: int = 50,
+                                             after: Optional[str] = None) -> ChatSessionWithMessages:
+        """Get chat session with a page of its messages, starting after message ID `after`."""
+        session = await self.get_chat_session(session_id, user_id)
+        
+        messages_page, document, summary = await asyncio.gather(
+            self._get_session_messages(session_id, limit, after),
+            self.document_service.get_document_by_id(session.document_id, user_id),
+            self.document_service.get_document_summary(session.document_id, user_id),
+            return_exceptions=True
+        )
+        if isinstance(document, Exception):
+            raise document
+        
+        # Summary is optional for display
+        summary_text = None if isinstance(summary, Exception) else summary.summary
+        messages, next_cursor = messages_page
+        
+        return ChatSessionWithMessages(
+            session=session,
+            messages=messages,
+            document_title=document.title,
+            document_summary=summary_text,
+            next_cursor=next_cursor
+        )
 
-    async def get_chat_session_with_messages(self, session_id: str, user_id: str, limit: int = 50) -> ChatSessionWithMessages:
-        """Get chat session with its messages."""
-        try:
-            session = await self.get_chat_session(session_id, user_id)
-            messages = await self._get_session_messages(session_id, limit)
-            
-            from services.document_service import DocumentService
-            document_service = DocumentService()
-            document = await document_service.get_document_by_id(session.document_id, user_id)
-            
-            # Get document summary if available
-            try:
-                summary = await document_service.get_document_summary(session.document_id, user_id)
-                summary_text = summary.summary
-            except:
-                summary_text = None
-            
-            return ChatSessionWithMessages(
-                session=session,
-                messages=messages,
-                document_title=document.title,
-                document_summary=summary_text
-            )
-            
-        except NotFoundError:
-            raise
-        except Exception as e:
-            raise ServiceUnavailableError(f"Could not retrieve chat session: {str(e)}")
-
-    async def get_user_chat_history(self, user_id: str) -> List[ChatSession]:
-        """Get all chat sessions for a user."""
-        try:
-            sessions = self.chat_sessions_collection.where('user_id', '==', user_id)\
-                .order_by('updated_at', direction='DESCENDING').get()
-            
-            chat_sessions = []
-            for session in sessions:
-                session_data = session.to_dict()
-                session_data['created_at'] = datetime.fromisoformat(session_data['created_at'])
-                session_data['updated_at'] = datetime.fromisoformat(session_data['updated_at'])
-                chat_sessions.append(ChatSession(**session_data))
-            
-            return chat_sessions
-            
-        except Exception as e:
-            raise ServiceUnavailableError(f"Could not retrieve chat history: {str(e)}")
+    @service_errors("Could not retrieve chat history")
+    async def get_user_chat_history(self, user_id: str, limit: Optional[int] = 20,
+                                    after: Optional[str] = None) -> Tuple[List[ChatSession], Optional[str]]:
+        """
+        Get a page of a user's chat sessions, most recently updated first.
+        
+        Args:
+            user_id: Owner of the sessions
+            limit: Page size, or None for every session
+            after: Session ID the previous page ended on
+            
+        Returns:
+            Tuple of (sessions, next_cursor); next_cursor is None on the last page
+        """
+        query = self.chat_sessions_collection.where('user_id', '==', user_id)\
+            .order_by('updated_at', direction='DESCENDING').select(CHAT_SESSION_FIELDS)
+        query = await start_after_id(query, self.chat_sessions_collection, after)
+        if limit is not None:
+            query = query.limit(limit)
+        
+        chat_sessions = []
+        async for session in query.stream():
+            chat_sessions.append(ChatSession(**session.to_dict()))
+        
+        next_cursor = chat_sessions[-1].id if limit is not None and len(chat_sessions) == limit else None
+        return chat_sessions, next_cursor
 
+    @service_errors("Could not delete chat session")
     async def delete_chat_session(self, session_id: str, user_id: str) -> bool:
         """Delete a chat session and all its messages."""
-        try:
-            await self.get_chat_session(session_id, user_id)
-            
-            messages = self.chat_messages_collection.where('chat_session_id', '==', session_id).get()
-            for message in messages:
-                message.reference.delete()
-            
-            self.chat_sessions_collection.document(session_id).delete()            
-            return True
-            
-        except NotFoundError:
-            raise
-        except Exception as e:
-            raise ServiceUnavailableError(f"Could not delete chat session: {str(e)}")
+        await self.get_chat_session(session_id, user_id)
+        
+        await delete_query_in_batches(self.db, self._messages_collection(session_id))
+        
+        await self.chat_sessions_collection.document(session_id).delete()            
+        _recent_messages_cache.pop(session_id, None)
+        return True
 
+    def _messages_collection(self, session_id: str):
+        """Messages live under their session, so reading them needs no index."""
+        return self.chat_sessions_collection.document(session_id).collection('messages')
+
+    @service_errors("Could not save message")
     async def _add_message(self, session_id: str, role: MessageRole, content: str) -> ChatMessage:
         """Add a message to a chat session."""
+        message_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        
+        message_dict = {
+            'id': message_id,
+            'chat_session_id': session_id,
+            'role': role.value,
+            'content': content,
+            'timestamp': now
+        }
+
+        # Save the message and bump the session counters in one commit
+        batch = self.db.batch()
+        batch.set(self._messages_collection(session_id).document(message_id), message_dict)
+        batch.update(self.chat_sessions_collection.document(session_id), {
+            'message_count': firestore.Increment(1),
+            'updated_at': now
+        })
+        _bump_message_writes(session_id)
         try:
-            message_id = str(uuid.uuid4())
-            
-            message_dict = {
-                'id': message_id,
-                'chat_session_id': session_id,
-                'role': role.value,
-                'content': content,
-                'timestamp': datetime.utcnow()
-            }
+            await batch.commit()
+        finally:
+            _bump_message_writes(session_id)
 
-            # Save to Firestore
-            self.chat_messages_collection.document(message_id).set({
-                **message_dict,
-                'timestamp': message_dict['timestamp'].isoformat()
-            })
+        cached_recent = _recent_messages_cache.get(session_id)
+        if cached_recent is not None:
+            cached_recent.append({'role': role.value, 'content': content})
 
-            # Update session message count
-            session_ref = self.chat_sessions_collection.document(session_id)
-            session_doc = session_ref.get()
-            current_count = session_doc.to_dict().get('message_count', 0) if session_doc.exists else 0
-            
-            session_ref.update({
-                'message_count': current_count + 1,
-                'updated_at': datetime.utcnow().isoformat()
-            })
+        return ChatMessage(**message_dict)
 
-            return ChatMessage(**message_dict)
-            
-        except Exception as e:
-            raise ServiceUnavailableError(f"Could not save message: {str(e)}")
-
-    async def _get_session_messages(self, session_id: str, limit: int = 50) -> List[ChatMessage]:
-        """Get messages for a chat session."""
+    async def _get_session_messages(self, session_id: str, limit: int = 50,
+                                    after: Optional[str] = None) -> Tuple[List[ChatMessage], Optional[str]]:
+        """Get a page of messages for a chat session, oldest first, and the next cursor."""
         try:
-            messages = self.chat_messages_collection.where('chat_session_id', '==', session_id)\
-                .order_by('timestamp').limit(limit).get()
+            messages_collection = self._messages_collection(session_id)
+            query = await start_after_id(messages_collection.order_by('timestamp'), messages_collection, after)
             
             chat_messages = []
-            for message in messages:
-                message_data = message.to_dict()
-                message_data['timestamp'] = datetime.fromisoformat(message_data['timestamp'])
-                chat_messages.append(ChatMessage(**message_data))
+            async for message in query.limit(limit).stream():
+                chat_messages.append(ChatMessage(**message.to_dict()))
             
-            return chat_messages
+            next_cursor = chat_messages[-1].id if len(chat_messages) == limit else None
+            return chat_messages, next_cursor
             
         except Exception:
-            return []
+            return [], None
 
     async def _get_recent_messages(self, session_id: str, limit: int = 10) -> List[dict]:
         """Get recent messages for AI context."""
+        if limit <= RECENT_MESSAGES_WINDOW:
+            cached_recent = _recent_messages_cache.get(session_id)
+            if cached_recent is not None:
+                return list(cached_recent)[-limit:]
+
+        writes_before = _message_write_versions.get(session_id, 0)
         try:
-            messages = self.chat_messages_collection.where('chat_session_id', '==', session_id)\
-                .order_by('timestamp', direction='DESCENDING').limit(limit).get()
+            query = self._messages_collection(session_id)\
+                .order_by('timestamp', direction='DESCENDING').select(['role', 'content'])\
+                .limit(max(limit, RECENT_MESSAGES_WINDOW))
             
             recent_messages = []
-            for message in messages:
+            async for message in query.stream():
                 message_data = message.to_dict()
                 recent_messages.append({
                     'role': message_data['role'],
                     'content': message_data['content']
                 })
             
-            return list(reversed(recent_messages))
+            recent_messages.reverse()
+            if _message_write_versions.get(session_id, 0) == writes_before:
+                _recent_messages_cache[session_id] = deque(recent_messages, maxlen=RECENT_MESSAGES_WINDOW)
+            return recent_messages[-limit:]
             
         except Exception:
             return []
 
-    async def _update_session_timestamp(self, session_id: str):
-        """Update session's last activity timestamp."""
-        try:
-            self.chat_sessions_collection.document(session_id).update({
-                'updated_at': datetime.utcnow().isoformat()
-            })
-        except Exception:
-            pass
-
     async def get_session_suggested_questions(self, session_id: str, user_id: str) -> List[str]:
         """Get suggested questions for a chat session based on the document."""
         try:
             session = await self.get_chat_session(session_id, user_id)
             
-            from services.document_service import DocumentService
-            document_service = DocumentService()
-            document = await document_service.get_document_by_id(session.document_id, user_id)
+            document = await self.document_service.get_document_by_id(session.document_id, user_id)
             
-            questions = await self.ai_service.generate_suggested_questions(
+            questions = await self.ai_service.generate_document_questions(
                 document.content, 
                 document.title
             )
@@ -296,4 +335,9 @@ You can ask me any questions about this document, and I'll help you understand i
                 "Are there any important deadlines?",
                 "What should I be most concerned about?",
                 "What are my rights according to this document?"
-            ]
\ No newline at end of file
+            ]
+
+@lru_cache(maxsize=1)
+def get_chat_service() -> ChatService:
+    """Process-wide chat service; it holds no per-request state."""
+    return ChatService()
@@ -1,16 +1,135 @@
-from typing import List, Optional, Dict, Any
+import asyncio
+import hashlib
+import logging
+import re
+from functools import lru_cache
+from cachetools import TTLCache
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from fastapi import UploadFile
+from google.api_core.exceptions import AlreadyExists
+from core.config import settings
 from core.firebase_config import get_firestore_client
-from models.document import Document, DocumentUpload, DocumentSummary, FileUploadResponse
-from models.chat import ChatSession
-from services.ai_service import VertexAIService
+from models.document import Document, DocumentHighlight, DocumentUpload, DocumentSummary, FileUploadResponse
+from services.ai_service import get_ai_service
 from services.file_storage_local import LocalFileStorage
+from services.file_storage_gcs import GCSFileStorage
 from utils.exceptions import NotFoundError, FileProcessingError, ServiceUnavailableError
 from utils.text_extractor import TextExtractor
+from utils.file_utils import get_file_extension
+from utils.firestore_utils import delete_query_in_batches, delete_references_in_batches, start_after_id
 
 import uuid
 
+# Recently read documents keyed by (document_id, user_id). Chat turns re-read
+# the same document on every message, so a short TTL absorbs most of them.
+_document_cache: TTLCache = TTLCache(maxsize=256, ttl=300)
+
+# Newest FIRST_PAGE_CACHE_SIZE documents per user; dropped whenever that user
+# uploads or deletes. Listing endpoints cap their page size at the same value.
+FIRST_PAGE_CACHE_SIZE = 100
+_user_documents_cache: TTLCache = TTLCache(maxsize=1024, ttl=30)
+
+# Filename keywords per document type, checked in priority order
+_DOCUMENT_TYPE_PATTERNS = (
+    ('contract', re.compile(r'contract|agreement|terms', re.IGNORECASE)),
+    ('policy', re.compile(r'policy|procedure|manual', re.IGNORECASE)),
+    ('report', re.compile(r'report|analysis|summary', re.IGNORECASE)),
+)
+
+logger = logging.getLogger(__name__)
+
+# In-flight summary generations keyed by document_id
+_summary_generations: Dict[str, asyncio.Future] = {}
+
+# Upload analysis runs in the background; cap how many hit Vertex at once
+_upload_processing_slots = asyncio.Semaphore(settings.UPLOAD_PROCESSING_CONCURRENCY)
+
+# Model highlights often come without a score, which DocumentHighlight requires
+DEFAULT_HIGHLIGHT_SCORE = 0.5
+
+def _with_highlight_scores(highlights: List[Any]) -> List[Any]:
+    return [
+        {'score': DEFAULT_HIGHLIGHT_SCORE, **highlight} if isinstance(highlight, dict) else highlight
+        for highlight in highlights
+    ]
+
+def _summary_from_data(data: Dict[str, Any]) -> DocumentSummary:
+    """
+    Validate a summary from model output.
+    
+    Highlights without a score get a neutral one instead of failing the whole
+    summary.
+    """
+    if data.get('highlights'):
+        data = {**data, 'highlights': _with_highlight_scores(data['highlights'])}
+    return DocumentSummary.model_validate(data)
+
+def _as_datetime(value: Any) -> Any:
+    """Parse the ISO-string timestamps older records stored; pass anything else through."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value
+
+def _hydrate_document(data: Dict[str, Any]) -> Document:
+    """
+    Build a Document from a stored record without re-validating it.
+    
+    Records were validated on write, so only the ISO-string timestamps of older
+    records need converting before model_construct.
+    """
+    for field in ('created_at', 'updated_at'):
+        if field in data:
+            data[field] = _as_datetime(data[field])
+    return Document.model_construct(**data)
+
+def _hydrate_summary(data: Dict[str, Any]) -> DocumentSummary:
+    """
+    Build a DocumentSummary from a stored record without re-validating it.
+    
+    Besides the timestamp, older records may hold highlights without a score,
+    which get the same neutral default as fresh model output.
+    """
+    if 'created_at' in data:
+        data['created_at'] = _as_datetime(data['created_at'])
+    data['highlights'] = [
+        DocumentHighlight.model_construct(**highlight) if isinstance(highlight, dict) else highlight
+        for highlight in _with_highlight_scores(data.get('highlights') or [])
+    ]
+    return DocumentSummary.model_construct(**data)
+
+def _build_summary(document_id: str, ai_result: Dict[str, Any], created_at: datetime,
+                   **extra: Any) -> DocumentSummary:
+    """Build a summary from model output; summary.model_dump() is the stored form."""
+    return _summary_from_data({
+        'document_id': document_id,
+        'summary': ai_result['summary'],
+        'key_points': ai_result['key_points'],
+        'highlights': ai_result.get('highlights', []),
+        'complexity_score': ai_result['complexity_score'],
+        'important_dates': ai_result.get('important_dates', []),
+        'obligations': ai_result.get('obligations', []),
+        'rights': ai_result.get('rights', []),
+        'risks': ai_result.get('risks', []),
+        'created_at': created_at,
+        **extra
+    })
+
+def _track_summary_generation(document_id: str, coro) -> asyncio.Future:
+    """Run a summary generation as a shared task until it finishes."""
+    task = asyncio.ensure_future(coro)
+    _summary_generations[document_id] = task
+
+    def _done(finished: asyncio.Future):
+        _summary_generations.pop(document_id, None)
+        if not finished.cancelled() and finished.exception() is not None:
+            # Background runs may have no waiter to surface the error
+            logger.error("Summary generation for document %s failed", document_id,
+                         exc_info=finished.exception())
+
+    task.add_done_callback(_done)
+    return task
+
 class DocumentService:
     """Document management service with GCS storage and auto-chat creation."""
     
@@ -19,13 +138,15 @@ class DocumentService:
         self.documents_collection = self.db.collection('documents')
         self.summaries_collection = self.db.collection('summaries')
         self.chat_sessions_collection = self.db.collection('chat_sessions')
-        self.ai_service = VertexAIService()
-        self.file_storage = LocalFileStorage()
+        self.summaries_by_hash_collection = self.db.collection('summaries_by_hash')
+        self.ai_service = get_ai_service()
+        self.file_storage = GCSFileStorage() if settings.STORAGE_BACKEND == 'gcs' else LocalFileStorage()
         self.text_extractor = TextExtractor()
 
     async def upload_document(self, user_id: str, document_data: DocumentUpload) -> Document:
         """Upload and process a document from text content."""
         document_id = str(uuid.uuid4())
+        now = datetime.utcnow()
         
         # Create document record
         doc_dict = {
@@ -34,31 +155,32 @@ class DocumentService:
             'content': document_data.content,
             'document_type': document_data.document_type,
             'user_id': user_id,
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
+            'created_at': now,
+            'updated_at': now
         }
 
         # Save to Firestore
-        self.documents_collection.document(document_id).set({
-            **doc_dict,
-            'created_at': doc_dict['created_at'].isoformat(),
-            'updated_at': doc_dict['updated_at'].isoformat()
-        })
+        await self.documents_collection.document(document_id).set(doc_dict)
+        _user_documents_cache.pop(user_id, None)
 
         return Document(**doc_dict)
 
     async def upload_file(self, user_id: str, file: UploadFile, custom_title: Optional[str] = None) -> Dict[str, Any]:
         """
-        Upload and process a file with GCS storage and automatic chat session creation.
+        Store a file and its extracted text, then analyze it in the background.
+        
+        The document is saved with processing_status 'processing' and returned
+        straight away. Its summary and suggested questions are produced by a
+        background job; get_document_summary waits on that job
+        rather than starting a second one.
         
         Returns:
-            Dict containing document info, summary, session data, and suggested questions
+            Dict containing document info and file info
         """
         try:
-            
+            # Both steps read the upload's spooled temp file; they share its
+            # file position and therefore run one after the other
             file_info = await self.file_storage.save_file(file, user_id, custom_title)
-            
-            await file.seek(0)
             text_content = await self.text_extractor.extract_text(file)
             
             if not text_content.strip():
@@ -67,6 +189,7 @@ class DocumentService:
             document_id = str(uuid.uuid4())
             title = custom_title or file.filename or f"Document_{document_id[:8]}"
             document_type = self._get_document_type(file.filename or "")
+            now = datetime.utcnow()
             
             doc_dict = {
                 'id': document_id,
@@ -75,115 +198,25 @@ class DocumentService:
                 'filename': file_info['original_filename'],
                 'blob_path': file_info['blob_path'],
                 'file_size': file_info['file_size'],
-                'file_type': self._get_file_extension(file_info['original_filename']),
+                'file_type': get_file_extension(file_info['original_filename']),
                 'content_type': file_info['content_type'],
                 'document_type': document_type,
                 'user_id': user_id,
                 'gcs_url': file_info['gcs_url'],
-                'created_at': datetime.utcnow(),
-                'updated_at': datetime.utcnow()
+                'content_hash': hashlib.sha256(text_content.encode()).hexdigest(),
+                'processing_status': 'processing',
+                'created_at': now,
+                'updated_at': now
             }
 
-            self.documents_collection.document(document_id).set({
-                **doc_dict,
-                'created_at': doc_dict['created_at'].isoformat(),
-                'updated_at': doc_dict['updated_at'].isoformat()
-            })
+            await self.documents_collection.document(document_id).set(doc_dict)
+            _user_documents_cache.pop(user_id, None)
             
-            try:
-                summary_data = await self.ai_service.summarize_document(text_content, title)
-                
-                summary_dict = {
-                    'document_id': document_id,
-                    'summary': summary_data['summary'],
-                    'key_points': summary_data['key_points'],
-                    'highlights': summary_data['highlights'],
-                    'complexity_score': summary_data['complexity_score'],
-                    'important_dates': summary_data.get('important_dates', []),
-                    'obligations': summary_data.get('obligations', []),
-                    'rights': summary_data.get('rights', []),
-                    'risks': summary_data.get('risks', []),
-                    'created_at': datetime.utcnow()
-                }
-                
-                summary_id = str(uuid.uuid4())
-                self.summaries_collection.document(summary_id).set({
-                    **summary_dict,
-                    'created_at': summary_dict['created_at'].isoformat()
-                })
-                
-            except Exception as e:
-                summary_data = {
-                    'summary': f"Document '{title}' has been uploaded and processed successfully.",
-                    'key_points': ["Document uploaded successfully", "Text content extracted"],
-                    'highlights': [],
-                    'complexity_score': 5,
-                    'important_dates': [],
-                    'obligations': [],
-                    'rights': [],
-                    'risks': []
-                }
-                
-                summary_dict = {
-                    'document_id': document_id,
-                    **summary_data,
-                    'created_at': datetime.utcnow()
-                }
-            
-            try:
-                session_id = str(uuid.uuid4())
-                chat_title = f"Discussion about {title}"
-                
-                session_dict = {
-                    'id': session_id,
-                    'user_id': user_id,
-                    'document_id': document_id,
-                    'title': chat_title,
-                    'created_at': datetime.utcnow(),
-                    'updated_at': datetime.utcnow(),
-                    'message_count': 1,
-                    'is_active': True
-                }
-
-                self.chat_sessions_collection.document(session_id).set({
-                    **session_dict,
-                    'created_at': session_dict['created_at'].isoformat(),
-                    'updated_at': session_dict['updated_at'].isoformat()
-                })
-                
-                initial_message = f"""I've analyzed your document "{title}" and here's what I found:
-
-**Summary:**
-{summary_data['summary']}
-
-**Key Points:**
-{chr(10).join(f'• {point}' for point in summary_data['key_points'])}
-
-I'm ready to answer any questions you have about this document. You can ask me about specific sections, legal implications, your obligations, or anything else you'd like to understand better."""
-
-                from services.chat_service import ChatService
-                chat_service = ChatService()
-                await chat_service._add_message(session_id, "ai", initial_message)
-                                
-            except Exception:
-                session_dict = None
-            
-            try:
-                suggested_questions = await self.ai_service.generate_suggested_questions(text_content, title)
-            except Exception as e:
-                suggested_questions = [
-                    "What are the main points of this document?",
-                    "What obligations do I have under this document?",
-                    "Are there any important deadlines?",
-                    "What should I be most concerned about?",
-                    "What are my rights according to this document?"
-                ]
+            document = Document(**doc_dict)
+            _track_summary_generation(document_id, self._process_upload(document, doc_dict['content_hash']))
             
             return {
-                'document': Document(**doc_dict),
-                'summary': DocumentSummary(**summary_dict),
-                'chat_session': ChatSession(**session_dict) if session_dict else None,
-                'suggested_questions': suggested_questions,
+                'document': document,
                 'file_info': {
                     'blob_path': file_info['blob_path'],
                     'gcs_url': file_info['gcs_url'],
@@ -197,29 +230,165 @@ I'm ready to answer any questions you have about this document. You can ask me a
         except Exception as e:
             raise FileProcessingError(f"File processing failed: {str(e)}")
 
-    async def get_user_documents(self, user_id: str) -> List[Document]:
-        """Get all documents for a user."""
+    async def upload_files(self, user_id: str, files: List[UploadFile]) -> List[Dict[str, Any]]:
+        """
+        Store several files from one request, processing them concurrently.
+        
+        Each file goes through upload_file, so storage writes and extraction
+        overlap across files instead of running one request at a time. One
+        file failing does not fail the others.
+        
+        Returns:
+            One dict per file, in order: upload_file's result, or the
+            filename and error message for a file that failed
+        """
+        results = await asyncio.gather(
+            *(self.upload_file(user_id, file) for file in files),
+            return_exceptions=True
+        )
+        return [
+            {'filename': file.filename, 'error': str(result)} if isinstance(result, Exception) else result
+            for file, result in zip(files, results)
+        ]
+
+    async def _process_upload(self, document: Document, content_hash: str) -> DocumentSummary:
+        """
+        Background analysis of an uploaded document.
+        
+        Writes the summary (with suggested questions) and marks the document
+        completed in one commit. Chat sessions are created when the user opens
+        one, not here.
+        """
+        async with _upload_processing_slots:
+            try:
+                return await self._analyze_upload(document, content_hash)
+            except Exception as e:
+                # Whatever failed, the document must not stay 'processing'
+                try:
+                    await self.documents_collection.document(document.id).update({
+                        'processing_status': 'failed',
+                        'error_message': str(e),
+                        'updated_at': datetime.utcnow()
+                    })
+                except Exception:
+                    pass
+                _document_cache.pop((document.id, document.user_id), None)
+                _user_documents_cache.pop(document.user_id, None)
+                raise ServiceUnavailableError(f"Failed to generate summary: {str(e)}") from e
+
+    async def _analyze_upload(self, document: Document, content_hash: str) -> DocumentSummary:
+        """Summarize an upload and commit the summary with the 'completed' status."""
+        document_ref = self.documents_collection.document(document.id)
+        title = document.title
+        
+        # Identical text uploaded before already has a summary; reuse it
+        # rather than asking the model again
+        hash_ref = self.summaries_by_hash_collection.document(content_hash)
         try:
-            docs = self.documents_collection.where('user_id', '==', user_id)\
-                .order_by('created_at', direction='DESCENDING').get()
-            
-            documents = []
-            for doc in docs:
-                doc_data = doc.to_dict()
-                doc_data['created_at'] = datetime.fromisoformat(doc_data['created_at'])
-                doc_data['updated_at'] = datetime.fromisoformat(doc_data['updated_at'])
-                documents.append(Document(**doc_data))
+            hash_doc = await hash_ref.get()
+            known_summary = hash_doc.to_dict() if hash_doc.exists else None
+        except Exception:
+            known_summary = None
+        
+        if known_summary:
+            # The matched summary carries its suggested questions too
+            summary_result = known_summary
+            questions_result = known_summary.get('suggested_questions')
+        else:
+            # Summary and suggested questions are independent model calls
+            summary_result, questions_result = await asyncio.gather(
+                self.ai_service.summarize_legal_document(document.content, title),
+                self.ai_service.generate_document_questions(document.content, title),
+                return_exceptions=True
+            )
+        
+        now = datetime.utcnow()
+        
+        if isinstance(summary_result, Exception):
+            raise summary_result
+        
+        summary_data = summary_result
+        if questions_result and not isinstance(questions_result, Exception):
+            suggested_questions = questions_result
+        else:
+            suggested_questions = [
+                "What are the main points of this document?",
+                "What obligations do I have under this document?",
+                "Are there any important deadlines?",
+                "What should I be most concerned about?",
+                "What are my rights according to this document?"
+            ]
+        
+        summary = _build_summary(document.id, summary_data, now, suggested_questions=suggested_questions)
+        summary_dict = summary.model_dump()
+        
+        # Summary and the status flip are committed together
+        batch = self.db.batch()
+        batch.set(self.summaries_collection.document(document.id), summary_dict)
+        if not known_summary:
+            batch.set(hash_ref, {
+                key: value for key, value in summary_dict.items() if key != 'document_id'
+            })
+        batch.update(document_ref, {'processing_status': 'completed', 'updated_at': now})
+        
+        await batch.commit()
+        _document_cache.pop((document.id, document.user_id), None)
+        _user_documents_cache.pop(document.user_id, None)
+        
+        return summary
+
+    async def get_user_documents(self, user_id: str, limit: Optional[int] = None,
+                                 after: Optional[str] = None) -> Tuple[List[Document], Optional[str]]:
+        """
+        Get a page of a user's documents, newest first.
+        
+        Args:
+            user_id: Owner of the documents
+            limit: Page size, or None for every document
+            after: Document ID the previous page ended on
             
-            return documents
+        Returns:
+            Tuple of (documents, next_cursor); next_cursor is None on the last page
+        """
+        # The cached first page serves any page size up to its own, and every
+        # request once it holds fewer documents than that (the full listing)
+        cached = _user_documents_cache.get(user_id) if after is None else None
+        if cached is not None and (limit is not None and limit <= FIRST_PAGE_CACHE_SIZE
+                                   or len(cached) < FIRST_PAGE_CACHE_SIZE):
+            documents = cached[:limit] if limit is not None else list(cached)
+        else:
+            # First pages are fetched at the cached size so later, larger
+            # first pages are still served from the cache
+            fill_cache = after is None and (limit is None or limit <= FIRST_PAGE_CACHE_SIZE)
+            fetch_limit = FIRST_PAGE_CACHE_SIZE if fill_cache and limit is not None else limit
+            try:
+                query = self.documents_collection.where('user_id', '==', user_id)\
+                    .order_by('created_at', direction='DESCENDING')
+                query = await start_after_id(query, self.documents_collection, after)
+                if fetch_limit is not None:
+                    query = query.limit(fetch_limit)
+                
+                documents = [_hydrate_document(doc.to_dict()) async for doc in query.stream()]
+                
+            except Exception as e:
+                raise ServiceUnavailableError(f"Failed to retrieve documents: {str(e)}")
             
-        except Exception as e:
-            raise ServiceUnavailableError(f"Failed to retrieve documents: {str(e)}")
+            if fill_cache:
+                _user_documents_cache[user_id] = documents[:FIRST_PAGE_CACHE_SIZE]
+            documents = documents[:limit] if limit is not None else documents
+        
+        next_cursor = documents[-1].id if limit is not None and len(documents) == limit else None
+        return documents, next_cursor
 
     async def get_document_by_id(self, document_id: str, user_id: str) -> Document:
         """Get a specific document by ID."""
+        cached = _document_cache.get((document_id, user_id))
+        if cached is not None:
+            return cached
+
         try:
             doc_ref = self.documents_collection.document(document_id)
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             
             if not doc.exists:
                 raise NotFoundError("Document not found")
@@ -228,11 +397,10 @@ I'm ready to answer any questions you have about this document. You can ask me a
             
             if doc_data['user_id'] != user_id:
                 raise NotFoundError("Document not found")
-
-            doc_data['created_at'] = datetime.fromisoformat(doc_data['created_at'])
-            doc_data['updated_at'] = datetime.fromisoformat(doc_data['updated_at'])
             
-            return Document(**doc_data)
+            document = _hydrate_document(doc_data)
+            _document_cache[(document_id, user_id)] = document
+            return document
             
         except NotFoundError:
             raise
@@ -244,24 +412,31 @@ I'm ready to answer any questions you have about this document. You can ask me a
         try:
             document = await self.get_document_by_id(document_id, user_id)
             
-            if hasattr(document, 'blob_path') and document.blob_path:
-                try:
-                    await self.file_storage.delete_file(document.blob_path, user_id)
-                except Exception:
-                    pass            
-            self.documents_collection.document(document_id).delete()
+            session_refs = [
+                session.reference async for session in
+                self.chat_sessions_collection.where('document_id', '==', document_id).select([]).stream()
+            ]
+            summary_refs = await self._summary_references(document_id)
+            
+            # The stored file and each session's messages are independent
+            await asyncio.gather(
+                self._delete_stored_file(document, user_id),
+                *(
+                    delete_query_in_batches(self.db, session_ref.collection('messages'))
+                    for session_ref in session_refs
+                )
+            )
             
-            summaries = self.summaries_collection.where('document_id', '==', document_id).get()
-            for summary in summaries:
-                summary.reference.delete()
+            await delete_references_in_batches(self.db, [
+                self.documents_collection.document(document_id),
+                *summary_refs,
+                *session_refs
+            ])
+            _document_cache.pop((document_id, user_id), None)
+            _user_documents_cache.pop(user_id, None)
             
-            sessions = self.chat_sessions_collection.where('document_id', '==', document_id).get()
-            for session in sessions:
-                session_id = session.id
-                messages = self.db.collection('chat_messages').where('chat_session_id', '==', session_id).get()
-                for message in messages:
-                    message.reference.delete()
-                session.reference.delete()
+            from services.chat_service import forget_recent_messages
+            forget_recent_messages(session_ref.id for session_ref in session_refs)
             
             return True
             
@@ -270,55 +445,106 @@ I'm ready to answer any questions you have about this document. You can ask me a
         except Exception as e:
             raise ServiceUnavailableError(f"Failed to delete document: {str(e)}")
 
+    async def _delete_stored_file(self, document: Document, user_id: str) -> None:
+        """Best-effort removal of a document's original upload."""
+        if getattr(document, 'blob_path', None):
+            try:
+                await self.file_storage.delete_file(document.blob_path, user_id)
+            except Exception:
+                pass
+
     async def get_document_summary(self, document_id: str, user_id: str) -> DocumentSummary:
         """Get or generate document summary."""
         try:
             # Verify document ownership
-            await self.get_document_by_id(document_id, user_id)
+            document = await self.get_document_by_id(document_id, user_id)
             
-            # Check if summary already exists
-            summary_query = self.summaries_collection.where('document_id', '==', document_id).limit(1).get()
+            # Summaries are stored under their document's ID
+            summary_ref = self.summaries_collection.document(document_id)
+            summary_doc = await summary_ref.get()
             
-            if summary_query:
-                summary_data = list(summary_query)[0].to_dict()
-                summary_data['created_at'] = datetime.fromisoformat(summary_data['created_at'])
-                return DocumentSummary(**summary_data)
+            if summary_doc.exists:
+                return _hydrate_summary(summary_doc.to_dict())
             
-            # Generate new summary if none exists
-            document = await self.get_document_by_id(document_id, user_id)
+            # Summaries written before keyed IDs live under random IDs
+            legacy_summaries = await self.summaries_collection.where('document_id', '==', document_id).limit(1).get()
+            if legacy_summaries:
+                summary_data = legacy_summaries[0].to_dict()
+                await summary_ref.set(summary_data)
+                await legacy_summaries[0].reference.delete()
+                return _hydrate_summary(summary_data)
             
-            ai_result = await self.ai_service.summarize_document(
-                document.content, 
-                document.title
-            )
-
-            summary_data = {
-                'document_id': document_id,
-                'summary': ai_result['summary'],
-                'key_points': ai_result['key_points'],
-                'highlights': ai_result.get('highlights', []),
-                'complexity_score': ai_result['complexity_score'],
-                'important_dates': ai_result.get('important_dates', []),
-                'obligations': ai_result.get('obligations', []),
-                'rights': ai_result.get('rights', []),
-                'risks': ai_result.get('risks', []),
-                'created_at': datetime.utcnow()
-            }
-
-            # Save summary
-            summary_id = str(uuid.uuid4())
-            self.summaries_collection.document(summary_id).set({
-                **summary_data,
-                'created_at': summary_data['created_at'].isoformat()
-            })
-
-            return DocumentSummary(**summary_data)
+            # Generate new summary if none exists; concurrent callers for the
+            # same document share one in-flight generation
+            task = _summary_generations.get(document_id)
+            if task is None:
+                task = _track_summary_generation(document_id, self._generate_summary(document, summary_ref))
+            
+            return await asyncio.shield(task)
             
         except NotFoundError:
             raise
         except Exception as e:
             raise ServiceUnavailableError(f"Failed to generate summary: {str(e)}")
 
+    async def delete_document_summary(self, document_id: str) -> int:
+        """
+        Delete a document's stored summary; returns how many were deleted.
+        
+        Legacy summaries stored under random IDs are removed too, so they
+        cannot be migrated back in place of a regenerated summary.
+        """
+        return await delete_references_in_batches(self.db, await self._summary_references(document_id))
+
+    async def _summary_references(self, document_id: str) -> list:
+        """References to a document's summaries, keyed and legacy alike."""
+        # Every stored summary carries its document_id, wherever it is keyed
+        query = self.summaries_collection.where('document_id', '==', document_id).select([])
+        return [snapshot.reference async for snapshot in query.stream()]
+
+    async def get_document_summaries(self, documents: List[Document]) -> Dict[str, Optional[DocumentSummary]]:
+        """
+        Get stored summaries for several of a user's documents at once.
+        
+        Summaries are read in a single batched get. A listing never starts a
+        generation; documents without a stored summary map to None until it is
+        requested through get_document_summary.
+        
+        Args:
+            documents: Documents already verified to belong to the caller
+            
+        Returns:
+            Dict mapping document ID to its summary, or None if unavailable
+        """
+        summaries: Dict[str, Optional[DocumentSummary]] = dict.fromkeys(doc.id for doc in documents)
+        summary_refs = [self.summaries_collection.document(doc.id) for doc in documents]
+        
+        try:
+            async for snapshot in self.db.get_all(summary_refs):
+                if snapshot.exists:
+                    summaries[snapshot.id] = _hydrate_summary(snapshot.to_dict())
+        except Exception:
+            pass
+        
+        return summaries
+
+    async def _generate_summary(self, document: Document, summary_ref) -> DocumentSummary:
+        """Summarize a document and store it unless another writer got there first."""
+        ai_result = await self.ai_service.summarize_legal_document(
+            document.content, 
+            document.title
+        )
+
+        summary = _build_summary(document.id, ai_result, datetime.utcnow())
+
+        try:
+            await summary_ref.create(summary.model_dump())
+        except AlreadyExists:
+            # Another process stored a summary first; serve that one
+            return _hydrate_summary((await summary_ref.get()).to_dict())
+
+        return summary
+
     async def get_document_with_file_content(self, document_id: str, user_id: str) -> bytes:
         """Get original file content from GCS."""
         try:
@@ -336,18 +562,16 @@ I'm ready to answer any questions you have about this document. You can ask me a
 
     def _get_document_type(self, filename: str) -> str:
         """Determine document type from filename."""
-        filename_lower = filename.lower()
-        if any(keyword in filename_lower for keyword in ['contract', 'agreement', 'terms']):
-            return 'contract'
-        elif any(keyword in filename_lower for keyword in ['policy', 'procedure', 'manual']):
-            return 'policy'
-        elif any(keyword in filename_lower for keyword in ['report', 'analysis', 'summary']):
-            return 'report'
-        else:
-            return 'legal'
+        return _document_type_for(filename)
+
+@lru_cache(maxsize=2048)
+def _document_type_for(filename: str) -> str:
+    for document_type, pattern in _DOCUMENT_TYPE_PATTERNS:
+        if pattern.search(filename):
+            return document_type
+    return 'legal'
 
-    def _get_file_extension(self, filename: str) -> str:
-        """Extract file extension from filename."""
-        if '.' in filename:
-            return '.' + filename.rsplit('.', 1)[1].lower()
-        return ''
+@lru_cache(maxsize=1)
+def get_document_service() -> DocumentService:
+    """Process-wide DocumentService sharing one Firestore client and AI service."""
+    return DocumentService()
@@ -1,14 +1,23 @@
 import uuid
 import os
+import sys
+import shutil
 import aiofiles
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, BinaryIO
 from datetime import datetime
 from pathlib import Path
 from fastapi import UploadFile
 
 from core.config import settings # Assuming you'll add LOCAL_STORAGE_PATH here
 from utils.exceptions import FileProcessingError, ServiceUnavailableError
+from utils.file_utils import get_file_extension
+
+# Extensions are compared lowercased, as get_file_extension returns them
+ALLOWED_EXTENSIONS = frozenset(extension.lower() for extension in settings.ALLOWED_EXTENSIONS)
+
+# Matches Starlette's spool size: larger uploads already live on disk
+STREAM_COPY_CHUNK_SIZE = 1024 * 1024
 
 class LocalFileStorage:
     """Local filesystem file management service."""
@@ -23,48 +32,92 @@ class LocalFileStorage:
             raise ServiceUnavailableError(f"Local storage unavailable: {str(e)}")
 
     async def save_file(self, file: UploadFile, user_id: str, custom_title: Optional[str] = None) -> Dict[str, Any]:
-        """Save uploaded file to the local filesystem."""
+        """
+        Save uploaded file to the local filesystem.
+        
+        The upload's spooled temp file is copied to storage in chunks (or with
+        os.sendfile once it has spilled to disk) rather than read into memory.
+        """
         try:
-            await self._validate_file(file)
-
-            file_extension = self._get_file_extension(file.filename or "")
-            unique_id = str(uuid.uuid4())
+            source = file.file
+            source.seek(0, os.SEEK_END)
+            file_size = source.tell()
+            source.seek(0)
+            self._validate_content(file_size, file.filename)
+
+            file_extension = get_file_extension(file.filename or "")
+            unique_id = uuid.uuid4().hex
             stored_filename = f"{unique_id}{file_extension}"
 
             # Create local file path: {base_path}/users/{user_id}/documents/{stored_filename}
             user_dir = self.base_path / "users" / user_id / "documents"
-            os.makedirs(user_dir, exist_ok=True)
             file_path = user_dir / stored_filename
             relative_path = file_path.relative_to(self.base_path)
 
-            # Write file content asynchronously
-            file_content = await file.read()
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(file_content)
-
-            await file.seek(0)
+            await asyncio.get_event_loop().run_in_executor(
+                None, self._copy_stream, source, file_path, file_size
+            )
 
             return {
                 'blob_path': str(relative_path), # Using 'blob_path' for compatibility
                 'stored_filename': stored_filename,
                 'original_filename': file.filename or 'unknown',
-                'file_size': len(file_content),
+                'file_size': file_size,
                 'content_type': file.content_type,
                 'gcs_url': None # No GCS URL for local files
             }
         except Exception as e:
             raise FileProcessingError(f"File upload failed: {str(e)}")
 
+    @staticmethod
+    def _copy_stream(source: BinaryIO, file_path: Path, file_size: int) -> None:
+        """Copy an upload stream to disk."""
+        try:
+            out = open(file_path, 'wb')
+        except FileNotFoundError:
+            # Only a user's first upload needs the directory made
+            os.makedirs(file_path.parent, exist_ok=True)
+            out = open(file_path, 'wb')
+        with out:
+            # Uploads above the spool threshold are already real files, so the
+            # kernel can copy them without passing through Python. Only Linux
+            # sendfile accepts a regular file as the destination.
+            if file_size >= STREAM_COPY_CHUNK_SIZE and sys.platform.startswith('linux'):
+                in_fd, out_fd, offset = source.fileno(), out.fileno(), 0
+                try:
+                    while offset < file_size:
+                        sent = os.sendfile(out_fd, in_fd, offset, file_size - offset)
+                        if not sent:
+                            break
+                        offset += sent
+                except OSError:
+                    # Some filesystems refuse it; finish with a plain copy
+                    source.seek(offset)
+                    out.seek(offset)
+                    shutil.copyfileobj(source, out, STREAM_COPY_CHUNK_SIZE)
+            else:
+                shutil.copyfileobj(source, out, STREAM_COPY_CHUNK_SIZE)
+
+    def get_file_path(self, blob_path: str, user_id: str) -> Path:
+        """
+        Resolve a stored file's path so it can be served with FileResponse,
+        which streams it with sendfile instead of loading it into memory.
+        """
+        # Security check
+        if not blob_path.startswith(f"users/{user_id}/"):
+            raise FileProcessingError("Access denied to file")
+
+        file_path = (self.base_path / blob_path).resolve()
+        if self.base_path.resolve() / "users" / user_id not in file_path.parents:
+            raise FileProcessingError("Access denied to file")
+        if not file_path.is_file():
+            raise FileProcessingError("File not found")
+        return file_path
+
     async def get_file_content(self, blob_path: str, user_id: str) -> bytes:
         """Retrieve file content from the local filesystem."""
         try:
-            # Security check
-            if not blob_path.startswith(f"users/{user_id}/"):
-                raise FileProcessingError("Access denied to file")
-
-            file_path = self.base_path / blob_path
-            if not file_path.is_file():
-                raise FileProcessingError("File not found")
+            file_path = self.get_file_path(blob_path, user_id)
 
             async with aiofiles.open(file_path, 'rb') as f:
                 return await f.read()
@@ -95,28 +148,19 @@ class LocalFileStorage:
     async def generate_signed_url(self, blob_path: str, user_id: str, expiration_minutes: int = 60) -> str:
         """
         Generate a local URL path for file access.
-        NOTE: This is not a 'signed' URL. It returns a predictable path.
-        You will need a separate endpoint to serve files from this path.
+        NOTE: This is not a 'signed' URL. It returns a predictable path,
+        served to the owning user by the /files endpoint.
         """
         if not blob_path.startswith(f"users/{user_id}/"):
             raise FileProcessingError("Access denied to file")
             
         return f"/api/v1/files/{blob_path}"
 
-    async def _validate_file(self, file: UploadFile) -> None:
-        """Validate uploaded file against size and extension limits."""
-        file_content = await file.read()
-        file_size = len(file_content)
-        await file.seek(0)
+    def _validate_content(self, file_size: int, filename: Optional[str]) -> None:
+        """Validate upload size and extension against configured limits."""
         if file_size > settings.MAX_FILE_SIZE:
             raise FileProcessingError(f"File size exceeds maximum allowed size")
-        if file.filename:
-            file_extension = self._get_file_extension(file.filename)
-            if file_extension.lower() not in settings.ALLOWED_EXTENSIONS:
+        if filename:
+            file_extension = get_file_extension(filename)
+            if file_extension not in ALLOWED_EXTENSIONS:
                 raise FileProcessingError(f"File type '{file_extension}' not allowed.")
-
-    def _get_file_extension(self, filename: str) -> str:
-        """Extract file extension from filename."""
-        if '.' in filename:
-            return '.' + filename.rsplit('.', 1)[1].lower()
-        return ''
\ No newline at end of file
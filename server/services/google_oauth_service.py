@@ -1,31 +1,57 @@
+import asyncio
+import hashlib
+import time
+import cachecontrol
+import requests as requests_lib
+from cachetools import TTLCache
 from google.auth.transport import requests
 from google.oauth2 import id_token
 from core.config import settings
 from typing import Optional, Dict
 
+# Google's signing certs are served with Cache-Control max-age; a caching
+# session keeps them in memory so verification is a local RSA check.
+_cert_request = requests.Request(session=cachecontrol.CacheControl(requests_lib.Session()))
+
+# Verified tokens keyed by digest; Google ID tokens live for at most an hour.
+_verified_tokens: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+
 class GoogleOAuthService:
     def __init__(self):
         self.client_id = settings.GOOGLE_CLIENT_ID
 
     async def verify_google_token(self, token: str) -> Optional[Dict]:
         """Verify Google ID token and return user info."""
+        token_key = hashlib.sha256(token.encode()).hexdigest()
+        cached = _verified_tokens.get(token_key)
+        if cached is not None:
+            expires_at, user_info = cached
+            if expires_at > time.time():
+                return dict(user_info)
+            _verified_tokens.pop(token_key, None)
+
         try:
-            idinfo = id_token.verify_oauth2_token(
-                token, 
-                requests.Request(), 
+            # A cert refresh is a blocking HTTPS call and the RSA check is
+            # CPU work; neither belongs on the event loop
+            idinfo = await asyncio.to_thread(
+                id_token.verify_oauth2_token,
+                token,
+                _cert_request,
                 self.client_id
             )
 
             if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
                 raise ValueError('Wrong issuer.')
 
-            return {
+            user_info = {
                 'google_id': idinfo['sub'],
                 'email': idinfo['email'],
                 'full_name': idinfo.get('name', ''),
                 'picture': idinfo.get('picture', ''),
                 'email_verified': idinfo.get('email_verified', False)
             }
+            _verified_tokens[token_key] = (idinfo.get('exp', 0), user_info)
+            return dict(user_info)
         except ValueError as e:
             print(f"Token verification failed: {e}")
-            return None
\ No newline at end of file
+            return None
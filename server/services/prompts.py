@@ -0,0 +1,109 @@
+from string import Template
+
+# Prompt templates are compiled once at import; callers substitute only the
+# per-request fields. JSON braces need no escaping inside string.Template.
+
+SUMMARY_PROMPT = Template("""As a legal expert, analyze this legal document and provide a structured response.
+
+Document Title: $title
+Document Content: $content
+
+Provide your analysis in the following JSON format:
+{
+    "summary": "A concise 2-3 paragraph summary of the document",
+    "key_points": ["5-7 most important points as bullet items"],
+    "complexity_score": 5,
+    "important_dates": ["Any deadlines, expiration dates, or time-sensitive items"],
+    "obligations": ["Key obligations or responsibilities"],
+    "rights": ["Important rights or entitlements"],
+    "highlights": [
+        {"text": "Important text snippet", "reason": "Why this is important", "section": "Document section"}
+    ]
+}
+
+Focus on making complex legal language accessible to non-lawyers while maintaining accuracy.""")
+
+CHUNK_SUMMARY_PROMPT = Template("""Analyze this section of a legal document titled "$title" (Part $part of $total).
+
+Content: $chunk
+
+Provide a brief summary and key points in JSON format:
+{
+    "summary": "Summary of this section",
+    "key_points": ["3-5 key points from this section"],
+    "important_dates": ["Any dates in this section"],
+    "obligations": ["Obligations mentioned"],
+    "rights": ["Rights mentioned"]
+}""")
+
+CHAT_SYSTEM_PROMPT = Template("""You are an expert legal AI assistant helping users understand legal documents.
+
+DOCUMENT CONTEXT:
+Title: $title
+Content: $content
+
+Your role is to:
+1. Answer questions about this specific document accurately
+2. Explain legal terms in plain English
+3. Highlight important obligations, rights, and deadlines
+4. Provide practical guidance when appropriate
+5. Reference specific parts of the document when relevant
+
+Be conversational, helpful, and always prioritize the user's understanding. If you're unsure about something specific to this document, say so rather than making assumptions.""")
+
+QUESTIONS_PROMPT = Template("""Based on this legal document, generate 5 helpful questions that would help someone understand it better:
+
+Title: $title
+Content: $content
+
+Focus on questions about:
+- Key obligations and rights
+- Important deadlines
+- Potential risks or concerns
+- Practical implications
+- Next steps
+
+Return as JSON array: ["question1", "question2", "question3", "question4", "question5"]""")
+
+# OpenAPI-style response schemas so Vertex returns well-formed JSON directly.
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "key_points": _STRING_LIST,
+        "complexity_score": {"type": "integer", "minimum": 1, "maximum": 10},
+        "important_dates": _STRING_LIST,
+        "obligations": _STRING_LIST,
+        "rights": _STRING_LIST,
+        "highlights": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string"},
+                    "reason": {"type": "string"},
+                    "section": {"type": "string"}
+                },
+                "required": ["text"]
+            }
+        }
+    },
+    "required": ["summary", "key_points", "complexity_score"]
+}
+
+CHUNK_SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "key_points": _STRING_LIST,
+        "important_dates": _STRING_LIST,
+        "obligations": _STRING_LIST,
+        "rights": _STRING_LIST
+    },
+    "required": ["summary", "key_points"]
+}
+
+QUESTIONS_SCHEMA = _STRING_LIST
@@ -1,11 +1,17 @@
+from functools import wraps
+from types import MappingProxyType
 from fastapi import HTTPException, status
 
+# Challenge header sent with every 401. Read-only: each raise passes its own
+# copy, as handlers may mutate exc.headers.
+BEARER_CHALLENGE_HEADERS = MappingProxyType({"WWW-Authenticate": "Bearer"})
+
 class AuthenticationError(HTTPException):
     def __init__(self, detail: str):
         super().__init__(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=detail,
-            headers={"WWW-Authenticate": "Bearer"}
+            headers=dict(BEARER_CHALLENGE_HEADERS)
         )
 
 class ValidationError(HTTPException):
@@ -35,3 +41,22 @@ class ServiceUnavailableError(HTTPException):
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=detail
         )
+
+def service_errors(message: str):
+    """
+    Decorate an async service method so unexpected failures surface as a 503.
+
+    NotFoundError passes through unchanged; anything else is wrapped as
+    ServiceUnavailableError(f"{message}: {error}").
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except NotFoundError:
+                raise
+            except Exception as e:
+                raise ServiceUnavailableError(f"{message}: {str(e)}")
+        return wrapper
+    return decorator
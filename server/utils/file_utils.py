@@ -0,0 +1,4 @@
+def get_file_extension(filename: str) -> str:
+    """Lowercased extension of a filename including the dot, or '' if it has none."""
+    _, dot, extension = filename.rpartition('.')
+    return '.' + extension.lower() if dot else ''
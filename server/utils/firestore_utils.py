@@ -0,0 +1,63 @@
+import asyncio
+
+FIRESTORE_BATCH_LIMIT = 500
+
+async def start_after_id(query, collection, after):
+    """Position a query after the document with ID `after`, if it still exists."""
+    if after:
+        cursor = await collection.document(after).get()
+        if cursor.exists:
+            query = query.start_after(cursor)
+    return query
+
+async def delete_query_in_batches(db, query) -> int:
+    """
+    Delete every document matched by a query using batched writes.
+
+    Args:
+        db: Async Firestore client
+        query: Async query whose results should be deleted
+
+    Returns:
+        Number of documents deleted
+    """
+    deleted_count = 0
+    batch = db.batch()
+    pending = 0
+
+    async for snapshot in query.stream():
+        batch.delete(snapshot.reference)
+        pending += 1
+
+        if pending == FIRESTORE_BATCH_LIMIT:
+            await batch.commit()
+            deleted_count += pending
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        await batch.commit()
+        deleted_count += pending
+
+    return deleted_count
+
+async def delete_references_in_batches(db, references) -> int:
+    """
+    Delete the given document references, committing batches concurrently.
+
+    Args:
+        db: Async Firestore client
+        references: Document references to delete
+
+    Returns:
+        Number of documents deleted
+    """
+    batches = []
+    for start in range(0, len(references), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for reference in references[start:start + FIRESTORE_BATCH_LIMIT]:
+            batch.delete(reference)
+        batches.append(batch.commit())
+
+    await asyncio.gather(*batches)
+    return len(references)
@@ -1,5 +1,14 @@
 import re
-from typing import List
+import hashlib
+from typing import Dict, List, Tuple
+from cachetools import LRUCache
+from core.config import settings
+
+# Sentence boundary: whitespace following terminal punctuation
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+# Punctuation trimmed from either end of a word before keyword matching
+_WORD_PUNCTUATION = '.,!?;:()[]{}'
 
 class DocumentChunker:
     """Utility for splitting large documents into manageable chunks for AI processing."""
@@ -20,6 +29,20 @@ class DocumentChunker:
         self.overlap_size = overlap_size
         self.preserve_sentences = preserve_sentences
 
+    @classmethod
+    def chunk_text(cls, text: str, max_tokens: int = 2000) -> List[str]:
+        """
+        Split text into chunks that fit a model token budget.
+        
+        Args:
+            text: Text to chunk
+            max_tokens: Approximate token budget per chunk (1 token ≈ 4 characters)
+            
+        Returns:
+            List of text chunks
+        """
+        return cls(max_chunk_size=max_tokens * 4).chunk_document(text)
+
     def chunk_document(self, text: str) -> List[str]:
         """
         Split document into chunks with optional sentence preservation.
@@ -33,6 +56,12 @@ class DocumentChunker:
         if len(text) <= self.max_chunk_size:
             return [text]
         
+        return list(_chunk_document_cached(
+            text, self.max_chunk_size, self.overlap_size, self.preserve_sentences
+        ))
+
+    def _split(self, text: str) -> List[str]:
+        """Split text with this chunker's settings, bypassing the cache."""
         if self.preserve_sentences:
             return self._chunk_by_sentences(text)
         else:
@@ -41,34 +70,39 @@ class DocumentChunker:
     def _chunk_by_sentences(self, text: str) -> List[str]:
         """Chunk text while preserving sentence boundaries."""
         try:
-            sentences = re.split(r'(?<=[.!?])\s+', text)
+            sentences = _SENTENCE_SPLIT.split(text)
             
             chunks = []
-            current_chunk = ""
+            # Sentences of the chunk being built and its joined length; joined
+            # once on flush instead of re-copying the chunk for every sentence
+            current_parts = []
+            current_length = 0
             
             for sentence in sentences:
                 sentence = sentence.strip()
                 if not sentence:
                     continue
                 
-                potential_chunk = current_chunk + (" " if current_chunk else "") + sentence
+                potential_length = current_length + (1 if current_parts else 0) + len(sentence)
                 
-                if len(potential_chunk) <= self.max_chunk_size:
-                    current_chunk = potential_chunk
+                if potential_length <= self.max_chunk_size:
+                    current_parts.append(sentence)
+                    current_length = potential_length
                 else:
-                    if current_chunk:
-                        chunks.append(current_chunk.strip())
+                    if current_parts:
+                        chunks.append(" ".join(current_parts))
                     
                     if len(sentence) > self.max_chunk_size:
                         long_sentence_chunks = self._chunk_by_characters(sentence)
                         chunks.extend(long_sentence_chunks[:-1])
-                        current_chunk = long_sentence_chunks[-1] if long_sentence_chunks else ""
+                        current_parts = long_sentence_chunks[-1:]
                     else:
-                        current_chunk = sentence
+                        current_parts = [sentence]
+                    current_length = len(current_parts[0]) if current_parts else 0
             
             # Add final chunk
-            if current_chunk.strip():
-                chunks.append(current_chunk.strip())
+            if current_parts:
+                chunks.append(" ".join(current_parts))
             
             # Add overlap if requested
             if self.overlap_size > 0:
@@ -83,15 +117,19 @@ class DocumentChunker:
         """Simple character-based chunking with overlap."""
         chunks = []
         start = 0
+        text_length = len(text)
+        max_chunk_size = self.max_chunk_size
+        # A word boundary is only used if it keeps at least 70% of the chunk
+        min_boundary_offset = max_chunk_size * 0.7
         
-        while start < len(text):
-            end = start + self.max_chunk_size
+        while start < text_length:
+            end = start + max_chunk_size
             
             # If this is not the last chunk, try to end at a word boundary
-            if end < len(text):
+            if end < text_length:
                 # Find the last space within the chunk
                 last_space = text.rfind(' ', start, end)
-                if last_space != -1 and last_space > start + (self.max_chunk_size * 0.7):
+                if last_space > start + min_boundary_offset:
                     end = last_space
             
             chunk = text[start:end].strip()
@@ -189,23 +227,32 @@ class DocumentChunker:
         if len(chunks) <= max_chunks:
             return chunks
         
+        vocabulary, chunk_bitmaps = _chunk_token_index(
+            text, self.max_chunk_size, self.overlap_size, self.preserve_sentences
+        )
+        
         # Extract keywords from query
-        query_words = set(word.lower().strip('.,!?;:()[]{}')
-                         for word in query.split()
-                         if len(word) > 2)
+        query_words = {word.strip(_WORD_PUNCTUATION)
+                       for word in query.lower().split()
+                       if len(word) > 2}
+        query_bitmap = 0
+        for word in query_words:
+            token_id = vocabulary.get(word)
+            if token_id is not None:
+                query_bitmap |= 1 << token_id
+        query_word_count = max(len(query_words), 1)
+        
+        query_lower = query.lower()
+        check_phrases = len(query.strip()) > 10
         
         chunk_scores = []
         for i, chunk in enumerate(chunks):
-            chunk_words = set(word.lower().strip('.,!?;:()[]{}')
-                             for word in chunk.split())
-            
-            # Calculate relevance score
-            overlap = query_words.intersection(chunk_words)
-            score = len(overlap) / max(len(query_words), 1)
+            # Calculate relevance score: shared keywords are the set bits
+            # common to the query and chunk bitmaps
+            score = (query_bitmap & chunk_bitmaps[i]).bit_count() / query_word_count
             
             # Boost score for exact phrase matches
-            if len(query.strip()) > 10:
-                query_lower = query.lower()
+            if check_phrases:
                 chunk_lower = chunk.lower()
                 if query_lower in chunk_lower:
                     score += 0.5
@@ -285,5 +332,69 @@ class DocumentChunker:
             'chunk_sizes': [len(chunk) for chunk in chunks]
         }
         
+def _text_key(text: str, *chunker_settings) -> tuple:
+    """Cache key for a document: a digest of its text plus the chunker settings."""
+    return (hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest(), *chunker_settings)
+
+def _chunks_size(chunks: Tuple[str, ...]) -> int:
+    return sum(len(chunk) for chunk in chunks) or 1
+
+def _token_index_size(index: Tuple[Dict[str, int], Tuple[int, ...]]) -> int:
+    vocabulary, chunk_bitmaps = index
+    return (sum(len(token) for token in vocabulary)
+            + sum(bitmap.bit_length() // 8 for bitmap in chunk_bitmaps)) or 1
+
+# Both caches are keyed on a digest rather than the text itself and bounded by
+# the approximate size of what they hold, so a few large documents cannot pin
+# gigabytes. Chunking only runs on the event loop, so no lock is needed.
+_chunk_cache: LRUCache = LRUCache(maxsize=settings.CHUNK_CACHE_BYTES, getsizeof=_chunks_size)
+_token_index_cache: LRUCache = LRUCache(maxsize=settings.CHUNK_CACHE_BYTES, getsizeof=_token_index_size)
+
+def _chunk_document_cached(text: str, max_chunk_size: int, overlap_size: int,
+                           preserve_sentences: bool) -> Tuple[str, ...]:
+    """
+    Chunk a document once per text and settings.
+    
+    Chat turns re-chunk the same document on every message; the settings are
+    part of the key because chunk_for_summarization adjusts max_chunk_size.
+    """
+    key = _text_key(text, max_chunk_size, overlap_size, preserve_sentences)
+    chunks = _chunk_cache.get(key)
+    if chunks is None:
+        chunks = tuple(DocumentChunker(max_chunk_size, overlap_size, preserve_sentences)._split(text))
+        if _chunks_size(chunks) <= _chunk_cache.maxsize:
+            _chunk_cache[key] = chunks
+    return chunks
+
+def _chunk_token_index(text: str, max_chunk_size: int, overlap_size: int,
+                       preserve_sentences: bool) -> Tuple[Dict[str, int], Tuple[int, ...]]:
+    """
+    Index a document's chunks for keyword scoring.
+    
+    Returns the token vocabulary (token -> bit) and one bitmap per chunk with
+    the bits of the tokens it contains, so each query is scored with an AND and
+    a popcount per chunk instead of re-tokenizing them.
+    """
+    key = _text_key(text, max_chunk_size, overlap_size, preserve_sentences)
+    index = _token_index_cache.get(key)
+    if index is not None:
+        return index
+
+    vocabulary: Dict[str, int] = {}
+    chunk_bitmaps = []
+    for chunk in _chunk_document_cached(text, max_chunk_size, overlap_size, preserve_sentences):
+        token_ids = {
+            vocabulary.setdefault(word.strip(_WORD_PUNCTUATION), len(vocabulary))
+            for word in chunk.lower().split()
+        }
+        bitmap = bytearray((len(vocabulary) + 7) // 8)
+        for token_id in token_ids:
+            bitmap[token_id >> 3] |= 1 << (token_id & 7)
+        chunk_bitmaps.append(int.from_bytes(bitmap, 'little'))
+    index = (vocabulary, tuple(chunk_bitmaps))
+    if _token_index_size(index) <= _token_index_cache.maxsize:
+        _token_index_cache[key] = index
+    return index
+
 # Backwards compatibility alias: some modules expect TextChunker
 TextChunker = DocumentChunker
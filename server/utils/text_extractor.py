@@ -1,21 +1,298 @@
 import io
+import os
+import codecs
+import shutil
+import tempfile
+import zipfile
 import asyncio
+import multiprocessing
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, BinaryIO, Callable, Optional, Tuple
 from fastapi import UploadFile
+from core.config import settings
 from utils.exceptions import FileProcessingError
+from utils.file_utils import get_file_extension
+
+try:
+    from charset_normalizer import from_bytes as charset_from_bytes
+except ImportError:
+    charset_from_bytes = None
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
 
 try:
     from pdfminer.high_level import extract_text as pdf_extract_text
     from pdfminer.layout import LAParams
 except ImportError:
-    try:
-        import pypdf
-    except ImportError:
-        pdf_extract_text = None
+    pdf_extract_text = None
 
 try:
-    from docx import Document as DocxDocument
+    from lxml import etree
 except ImportError:
-    DocxDocument = None
+    etree = None
+else:
+    # Compiled once; walking the XML directly avoids python-docx's per-paragraph
+    # and per-cell proxy objects, which dominate on large tables
+    _W = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+    _DOCX_PARAGRAPHS = etree.XPath('./w:p', namespaces=_W)
+    _DOCX_ROWS = etree.XPath('./w:tr', namespaces=_W)
+    _DOCX_CELLS = etree.XPath('./w:tc', namespaces=_W)
+    _DOCX_RUN_CONTENT = etree.XPath('./w:r/* | ./w:hyperlink/w:r/*', namespaces=_W)
+    _DOCX_TAG_TEXT = {
+        '{%s}tab' % _W['w']: '\t',
+        '{%s}br' % _W['w']: '\n',
+        '{%s}cr' % _W['w']: '\n',
+    }
+    _DOCX_TEXT_TAG = '{%s}t' % _W['w']
+    _DOCX_PARAGRAPH_TAG = '{%s}p' % _W['w']
+    _DOCX_TABLE_TAG = '{%s}tbl' % _W['w']
+    _DOCX_BODY_TAG = '{%s}body' % _W['w']
+
+# Package relationships name the main document part; this is its usual path
+_DOCX_RELS_PATH = '_rels/.rels'
+_DOCX_DEFAULT_PART = 'word/document.xml'
+_DOCX_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+def _docx_paragraph_text(paragraph) -> str:
+    """Text of a w:p element, matching python-docx's Paragraph.text."""
+    parts = []
+    for element in _DOCX_RUN_CONTENT(paragraph):
+        if element.tag == _DOCX_TEXT_TAG:
+            parts.append(element.text or '')
+        else:
+            parts.append(_DOCX_TAG_TEXT.get(element.tag, ''))
+    return ''.join(parts)
+
+def _pdfminer_laparams() -> "LAParams":
+    """
+    Layout settings for pdfminer.
+    
+    With FAST_PDF_TEXT, text inside figures is not laid out, vertical text is
+    not detected and boxes are not reordered, which skips most of the layout
+    work on drawing-heavy pages. Without it, the full analysis runs.
+    """
+    if settings.FAST_PDF_TEXT:
+        return LAParams(
+            all_texts=False,
+            detect_vertical=False,
+            word_margin=0.1,
+            char_margin=2.0,
+            line_margin=0.5,
+            boxes_flow=None
+        )
+    return LAParams(
+        all_texts=True,
+        detect_vertical=True,
+        word_margin=0.1,
+        char_margin=2.0,
+        line_margin=0.5,
+        boxes_flow=0.5
+    )
+
+def _decode_text(content: bytes) -> str:
+    """
+    Decode a text upload, trying UTF-8 first and detecting anything else.
+    
+    UTF-16 is recognised by its BOM; other encodings are detected with
+    charset-normalizer in one pass instead of trial-decoding the whole file
+    per candidate. latin-1 is the last resort as it accepts any bytes.
+    """
+    if content.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return content.decode('utf-16')
+    try:
+        return content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        pass
+    
+    if charset_from_bytes is not None:
+        best = charset_from_bytes(content).best()
+        if best is not None:
+            return str(best)
+    return content.decode('latin-1')
+
+# Container signatures: PDF header, ZIP (DOCX) and OLE2 (legacy .doc)
+_FILE_SIGNATURES = (
+    (b'%PDF-', 'pdf'),
+    (b'PK\x03\x04', 'docx'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole'),
+)
+_EXTENSION_KINDS = {'.pdf': 'pdf', '.docx': 'docx', '.doc': 'docx', '.txt': 'txt'}
+
+def _sniff_file_kind(header: bytes) -> Optional[str]:
+    """Identify a file from its first bytes, or None if no signature matches."""
+    for signature, kind in _FILE_SIGNATURES:
+        if header.startswith(signature):
+            return kind
+    return None
+
+# Text uploads below this are read and decoded on the event loop; a thread
+# hand-off would cost more than the work
+INLINE_TEXT_BYTES = 64 * 1024
+
+# Chunk size for copying an upload to disk for the extraction workers
+SPILL_CHUNK_SIZE = 1024 * 1024
+
+# Pages of a PDF read per extraction task; longer PDFs fan out over the pool
+PDF_PAGES_PER_TASK = 50
+
+# Maps '!' and '?' to '.' so sentences split on a single terminator
+_SENTENCE_ENDS = str.maketrans('!?', '..')
+
+@lru_cache(maxsize=1)
+def _extraction_pool() -> ProcessPoolExecutor:
+    """
+    Worker processes for PDF/DOCX parsing.
+    
+    The parsers are CPU-bound and mostly hold the GIL, so threads would run
+    concurrent uploads one at a time. Workers come from a forkserver rather
+    than a fork of the app, whose gRPC and executor threads are not safe to
+    fork.
+    """
+    return ProcessPoolExecutor(
+        max_workers=settings.EXTRACTION_WORKERS,
+        mp_context=multiprocessing.get_context('forkserver')
+    )
+
+def shutdown_extraction_pool() -> None:
+    """Stop the extraction workers, if any were started."""
+    if _extraction_pool.cache_info().currsize:
+        _extraction_pool().shutdown()
+        _extraction_pool.cache_clear()
+
+def _spill_upload(source: BinaryIO, suffix: str) -> str:
+    """Copy an upload to a temporary file in chunks; returns its path."""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as handle:
+        shutil.copyfileobj(source, handle, SPILL_CHUNK_SIZE)
+    return handle.name
+
+@asynccontextmanager
+async def _upload_on_disk(source: BinaryIO, suffix: str) -> AsyncIterator[str]:
+    """
+    Path of an on-disk copy of an upload, removed afterwards.
+    
+    Open files cannot cross the process boundary. Workers open this path
+    instead, so the upload is never held in memory in full.
+    """
+    path = await asyncio.to_thread(_spill_upload, source, suffix)
+    try:
+        yield path
+    finally:
+        os.unlink(path)
+
+async def _run_extraction(extract: Callable[[str], str], path: str) -> str:
+    """Parse a file in the extraction pool."""
+    return await asyncio.get_running_loop().run_in_executor(_extraction_pool(), extract, path)
+
+def _extract_pdf_pages_sync(path: str, start: int, stop: int) -> Tuple[int, str]:
+    """Extract pages [start, stop) with MuPDF; returns the page count and their text."""
+    with pymupdf.open(path, filetype="pdf") as doc:
+        stop = min(stop, doc.page_count)
+        return doc.page_count, "\n".join(doc[number].get_text("text") for number in range(start, stop))
+
+async def _extract_pdf_pages(path: str) -> str:
+    """
+    Extract PDF text with MuPDF, spreading long documents over the pool.
+    
+    MuPDF is not thread-safe, so pages are split into ranges that separate
+    worker processes open and read. Only the path crosses the process
+    boundary. The first range also reports the page count, so short
+    documents still take a single round trip.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _extraction_pool()
+    step = PDF_PAGES_PER_TASK
+    
+    page_count, first = await loop.run_in_executor(pool, _extract_pdf_pages_sync, path, 0, step)
+    rest = await asyncio.gather(*(
+        loop.run_in_executor(pool, _extract_pdf_pages_sync, path, start, start + step)
+        for start in range(step, page_count, step)
+    ))
+    return "\n".join([first, *(text for _, text in rest)])
+
+def _extract_pdf_fallback_sync(path: str) -> str:
+    """Extract PDF text with pdfminer, then pypdf, for PDFs MuPDF cannot read."""
+    text = ""
+    
+    if pdf_extract_text is not None:
+        text = pdf_extract_text(path, laparams=_pdfminer_laparams())
+    
+    if not text or text.isspace():
+        # Fallback to pypdf if pdfminer returns empty
+        try:
+            import pypdf
+            reader = pypdf.PdfReader(path)
+            text = "\n".join(page.extract_text() for page in reader.pages)
+        except ImportError:
+            pass
+    
+    return text
+
+def _docx_main_part(package: zipfile.ZipFile) -> str:
+    """Name of the main document part, as given by the package relationships."""
+    part_name = _DOCX_DEFAULT_PART
+    try:
+        relationships = etree.fromstring(package.read(_DOCX_RELS_PATH))
+    except KeyError:
+        relationships = None
+    if relationships is not None:
+        for relationship in relationships:
+            if relationship.get('Type') == _DOCX_OFFICE_DOCUMENT:
+                part_name = relationship.get('Target', part_name).lstrip('/')
+                break
+    return part_name
+
+def _extract_docx_sync(path: str) -> str:
+    """
+    Extract DOCX body paragraphs, then table rows as ' | '-joined cells.
+    
+    The document XML is streamed with iterparse: each top-level paragraph or
+    table is read as soon as it closes and then dropped, so the parsed tree
+    never holds more than one of them. python-docx is not needed, which also
+    skips loading the styles, numbering and other package parts.
+    """
+    text_parts = []
+    table_parts = []
+    
+    # Read straight from the zip member, so the XML is never held whole
+    with zipfile.ZipFile(path) as package, package.open(_docx_main_part(package)) as document_xml:
+        for _, element in etree.iterparse(
+            document_xml, events=('end',), tag=(_DOCX_PARAGRAPH_TAG, _DOCX_TABLE_TAG)
+        ):
+            body = element.getparent()
+            # Paragraphs inside tables are read with their table
+            if body is None or body.tag != _DOCX_BODY_TAG:
+                continue
+            
+            if element.tag == _DOCX_PARAGRAPH_TAG:
+                # Extract text from paragraphs
+                paragraph_text = _docx_paragraph_text(element).strip()
+                if paragraph_text:
+                    text_parts.append(paragraph_text)
+            else:
+                # Extract text from tables; they follow all paragraphs
+                for row in _DOCX_ROWS(element):
+                    row_text = []
+                    for cell in _DOCX_CELLS(row):
+                        cell_text = "\n".join(
+                            _docx_paragraph_text(paragraph) for paragraph in _DOCX_PARAGRAPHS(cell)
+                        ).strip()
+                        if cell_text:
+                            row_text.append(cell_text)
+                    if row_text:
+                        table_parts.append(" | ".join(row_text))
+            
+            # Release what has been read
+            element.clear()
+            while element.getprevious() is not None:
+                del body[0]
+    
+    text_parts.extend(table_parts)
+    return "\n".join(text_parts)
 
 class TextExtractor:
     """Utility class for extracting text from various file formats."""
@@ -35,21 +312,32 @@ class TextExtractor:
             FileProcessingError: If text extraction fails
         """
         filename = file.filename or ""
-        file_extension = TextExtractor._get_file_extension(filename).lower()
+        file_extension = get_file_extension(filename)
         
         try:
-            # Read file content
-            content = await file.read()
+            source = file.file
+            source.seek(0)
+            # The leading bytes say what the file really is; the extension
+            # only decides when they match no known container
+            file_kind = _sniff_file_kind(source.read(8)) or _EXTENSION_KINDS.get(file_extension)
+            source.seek(0)
             
             # Extract text based on file type
-            if file_extension == '.pdf':
-                return await TextExtractor._extract_pdf_text(content)
-            elif file_extension in ['.docx']:
-                return await TextExtractor._extract_docx_text(content)
-            elif file_extension in ['.doc']:
-                # For .doc files, we'll attempt docx extraction (limited support)
-                return await TextExtractor._extract_docx_text(content)
-            elif file_extension == '.txt':
+            if file_kind == 'pdf':
+                return await TextExtractor._extract_pdf_text(source)
+            elif file_kind == 'docx':
+                # Also covers .doc files that are really DOCX
+                return await TextExtractor._extract_docx_text(source)
+            elif file_kind == 'ole':
+                raise FileProcessingError(
+                    "Legacy Word (.doc) files are not supported; please save the document as .docx"
+                )
+            elif file_kind == 'txt':
+                # Small uploads are still in the in-memory spool
+                if file.size is not None and file.size < INLINE_TEXT_BYTES:
+                    content = source.read()
+                else:
+                    content = await asyncio.to_thread(source.read)
                 return await TextExtractor._extract_txt_text(content)
             else:
                 raise FileProcessingError(f"Unsupported file type: {file_extension}")
@@ -60,87 +348,49 @@ class TextExtractor:
             raise FileProcessingError(f"Failed to extract text from file: {str(e)}")
 
     @staticmethod
-    async def _extract_pdf_text(content: bytes) -> str:
+    async def _extract_pdf_text(source: BinaryIO) -> str:
         """Extract text from PDF content."""
-        if pdf_extract_text is None:
+        if pymupdf is None and pdf_extract_text is None:
             raise FileProcessingError("PDF processing library not available")
         
         try:
-            # Use pdfminer for better text extraction
-            def extract():
-                return pdf_extract_text(
-                    io.BytesIO(content),
-                    laparams=LAParams(
-                        all_texts=True,
-                        detect_vertical=True,
-                        word_margin=0.1,
-                        char_margin=2.0,
-                        line_margin=0.5,
-                        boxes_flow=0.5
-                    )
-                )
-            
-            # Run in thread to avoid blocking
-            text = await asyncio.get_event_loop().run_in_executor(None, extract)
-            
-            if not text.strip():
-                # Fallback to pypdf if pdfminer returns empty
-                try:
-                    import pypdf
-                    def pypdf_extract():
-                        reader = pypdf.PdfReader(io.BytesIO(content))
-                        text_parts = []
-                        for page in reader.pages:
-                            text_parts.append(page.extract_text())
-                        return "\n".join(text_parts)
-                    
-                    text = await asyncio.get_event_loop().run_in_executor(None, pypdf_extract)
-                except ImportError:
-                    pass
+            async with _upload_on_disk(source, '.pdf') as path:
+                text = ""
+                
+                if pymupdf is not None:
+                    # MuPDF parses content streams in C, far faster than pdfminer
+                    text = await _extract_pdf_pages(path)
+                
+                if not text or text.isspace():
+                    # Use pdfminer when MuPDF is unavailable or finds no text
+                    text = await _run_extraction(_extract_pdf_fallback_sync, path)
             
-            if not text.strip():
+            # Stripped once; the text can be tens of megabytes
+            text = text.strip()
+            if not text:
                 raise FileProcessingError("No text content found in PDF")
                 
-            return text.strip()
+            return text
             
         except Exception as e:
             raise FileProcessingError(f"Failed to extract text from PDF: {str(e)}")
 
     @staticmethod
-    async def _extract_docx_text(content: bytes) -> str:
+    async def _extract_docx_text(source: BinaryIO) -> str:
         """Extract text from DOCX/DOC content."""
-        if DocxDocument is None:
+        if etree is None:
             raise FileProcessingError("DOCX processing library not available")
         
         try:
-            def extract():
-                doc = DocxDocument(io.BytesIO(content))
-                text_parts = []
-                
-                # Extract text from paragraphs
-                for paragraph in doc.paragraphs:
-                    if paragraph.text.strip():
-                        text_parts.append(paragraph.text.strip())
-                
-                # Extract text from tables
-                for table in doc.tables:
-                    for row in table.rows:
-                        row_text = []
-                        for cell in row.cells:
-                            if cell.text.strip():
-                                row_text.append(cell.text.strip())
-                        if row_text:
-                            text_parts.append(" | ".join(row_text))
-                
-                return "\n".join(text_parts)
+            async with _upload_on_disk(source, '.docx') as path:
+                text = await _run_extraction(_extract_docx_sync, path)
             
-            # Run in thread to avoid blocking
-            text = await asyncio.get_event_loop().run_in_executor(None, extract)
-            
-            if not text.strip():
+            # Stripped once; the text can be tens of megabytes
+            text = text.strip()
+            if not text:
                 raise FileProcessingError("No text content found in document")
                 
-            return text.strip()
+            return text
             
         except Exception as e:
             raise FileProcessingError(f"Failed to extract text from document: {str(e)}")
@@ -149,29 +399,19 @@ class TextExtractor:
     async def _extract_txt_text(content: bytes) -> str:
         """Extract text from TXT content."""
         try:
-            # Try different encodings
-            encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1252']
-            
-            for encoding in encodings:
-                try:
-                    text = content.decode(encoding)
-                    if text.strip():
-                        return text.strip()
-                except UnicodeDecodeError:
-                    continue
+            if len(content) < INLINE_TEXT_BYTES:
+                text = _decode_text(content)
+            else:
+                text = await asyncio.to_thread(_decode_text, content)
+            text = text.strip()
+            if text:
+                return text
             
             raise FileProcessingError("Unable to decode text file with any supported encoding")
             
         except Exception as e:
             raise FileProcessingError(f"Failed to extract text from file: {str(e)}")
 
-    @staticmethod
-    def _get_file_extension(filename: str) -> str:
-        """Extract file extension from filename."""
-        if '.' in filename:
-            return '.' + filename.rsplit('.', 1)[1].lower()
-        return ''
-
     @staticmethod
     def estimate_reading_time(text: str, words_per_minute: int = 200) -> int:
         """
@@ -198,16 +438,20 @@ class TextExtractor:
         Returns:
             Dict with text statistics
         """
-        lines = text.split('\n')
-        words = text.split()
-        sentences = text.replace('!', '.').replace('?', '.').split('.')
-        sentences = [s.strip() for s in sentences if s.strip()]
+        # Only the sentence count is filtered, and it is tallied without
+        # keeping a stripped copy of every sentence. The word count also feeds
+        # the reading-time estimate instead of splitting the text again.
+        word_count = len(text.split())
+        sentence_count = sum(
+            1 for sentence in text.translate(_SENTENCE_ENDS).split('.')
+            if sentence and not sentence.isspace()
+        )
         
         return {
             'character_count': len(text),
-            'word_count': len(words),
-            'line_count': len(lines),
-            'sentence_count': len(sentences),
-            'average_words_per_sentence': len(words) / max(len(sentences), 1),
-            'estimated_reading_time_minutes': TextExtractor.estimate_reading_time(text)
+            'word_count': word_count,
+            'line_count': text.count('\n') + 1,
+            'sentence_count': sentence_count,
+            'average_words_per_sentence': word_count / max(sentence_count, 1),
+            'estimated_reading_time_minutes': max(1, word_count // 200)
         }
\ No newline at end of file